@@ -0,0 +1,311 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from random import randint, seed
+import gmpy2
+from curve import COORDINATES
+from field import FIELDS, PrimeField
+from point import normalise_all
+from discrete_log import pohlig_hellman, bsgs, build_baby_steps, baby_step_cache
+from parallel import parallel_rho
+from tables import BabyStepCache
+from projective_ecdlp_test import easy, medium, hard, challenge, subgroup
+
+# Every benchmark reseeds before its setup and
+# before each run, so runs time the same inputs
+SEED = 0
+
+# Untimed runs before the timed repeats, the median
+# of the repeats is reported and their minimum,
+# which is steadier, compared with the baseline
+WARMUP = 1
+REPEATS = 5
+
+# Slowdown against the baseline flagged
+# as a regression, 0.25 is 25% slower
+TOLERANCE = 0.25
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+
+# name -> (setup, slow, warmup, repeats)
+BENCHMARKS = {}
+
+
+def benchmark(name, slow=False, warmup=WARMUP, repeats=REPEATS):
+    """
+    Register setup() as benchmark `name`. setup returns
+    (run, ops) where run() is timed and does ops
+    operations, results are seconds per operation.
+    It may return (run, ops, prepare) with prepare()
+    called untimed before every run.
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, slow, warmup, repeats)
+        return setup
+    return register
+
+
+def random_points(E, P, n, normalised=False):
+    # consecutive multiples of a random multiple of P,
+    # each with a random scaling unless normalised
+    pts = []
+    R = randint(1, E.q) * P
+    for _ in range(n):
+        R = (R + P).normalise_coordinates()
+        if normalised:
+            pts.append(R.copy())
+            continue
+        z = randint(1, E.q - 1)
+        if E.coordinates == "jacobian":
+            x, y = R.x * z * z % E.q, R.y * z * z * z % E.q
+        else:
+            x, y = R.x * z % E.q, R.y * z % E.q
+        pts.append(E.point(E, x, y, R.z * z % E.q, check=False))
+    return pts
+
+
+def _field_mul(field, samples=10000):
+    def setup():
+        F = FIELDS[field](hard['p'])
+        xs = [F.to_field(randint(0, hard['p'] - 1)) for _ in range(samples)]
+        pairs = list(zip(xs, reversed(xs)))
+        mul = F.mul
+
+        def run():
+            for x, y in pairs:
+                mul(x, y)
+        return run, samples
+    return setup
+
+
+def _formula(name, coordinates, field, samples=2000):
+    def setup():
+        E, P, _ = challenge(hard, coordinates=coordinates, field=field)
+        pts = random_points(E, P, samples)
+        others = random_points(E, 3 * P, samples, normalised=True)
+        formula = getattr(E, name)
+        if name in ("_add", "_madd"):
+            args = list(zip(pts, others if name == "_madd" else reversed(pts)))
+        elif name == "_mmadd":
+            args = list(zip(random_points(E, P, samples, normalised=True), others))
+        elif name == "_mdouble":
+            args = [(R,) for R in others]
+        else:
+            args = [(R,) for R in pts]
+
+        def run():
+            for a in args:
+                formula(*a)
+        return run, samples
+    return setup
+
+
+def _scalar_mul(coordinates, field, fixed_base=False, samples=50):
+    def setup():
+        E, P, _ = challenge(hard, coordinates=coordinates, field=field)
+        if fixed_base:
+            P.precompute()
+        ks = [randint(1, hard['n'] - 1) for _ in range(samples)]
+
+        def run():
+            for k in ks:
+                k * P
+        return run, samples
+    return setup
+
+
+def _normalise_queue(batch, samples=20000):
+    def setup():
+        E, P, _ = challenge(hard)
+        pts = random_points(E, P, samples)
+        coords = [(R.x, R.y, R.z) for R in pts]
+
+        def prepare():
+            # Normalising is in place, start from
+            # the same coordinates every run
+            for R, (x, y, z) in zip(pts, coords):
+                R.x, R.y, R.z = x, y, z
+
+        def run():
+            for i in range(0, samples, batch):
+                normalise_all(pts[i:i + batch])
+        return run, samples, prepare
+    return setup
+
+
+def _baby_steps(m=2 ** 16):
+    def setup():
+        P = subgroup(hard, hard['n_factors'][-5][0])
+
+        def run():
+            build_baby_steps(P, m)
+        return run, m // 2
+    return setup
+
+
+def _giant_steps(samples=5):
+    def setup():
+        # Largest prime of medium, baby steps built once
+        pi = medium['n_factors'][-1][0]
+        P = subgroup(medium, pi)
+        cache = BabyStepCache()
+        bsgs(P, P, medium['n'], upper_bound=pi, cache=cache)
+        targets = [(d, d * P) for d in (randint(0, pi - 1) for _ in range(samples))]
+
+        def run():
+            for d, Q in targets:
+                assert bsgs(P, Q, medium['n'], upper_bound=pi, cache=cache) == d
+        return run, samples
+    return setup
+
+
+def _rho(samples=3):
+    def setup():
+        # 34-bit prime of hard
+        pi = hard['n_factors'][-5][0]
+        P = subgroup(hard, pi)
+        targets = [(d, d * P) for d in (randint(0, pi - 1) for _ in range(samples))]
+
+        def run():
+            for d, Q in targets:
+                assert parallel_rho(P, Q, hard['n'], upper_bound=pi) == d
+        return run, samples
+    return setup
+
+
+def _dlog(data):
+    def setup():
+        _, P, Q = challenge(data)
+
+        def run():
+            baby_step_cache.clear()
+            assert pohlig_hellman(P, Q, data['n'], data['n_factors']) == data['d']
+        return run, 1
+    return setup
+
+
+for field in FIELDS:
+    benchmark(f"field.mul.{field}")(_field_mul(field))
+for coordinates in COORDINATES:
+    for field in FIELDS:
+        if coordinates == "jacobian" and field != PrimeField.name:
+            # Jacobian points are only supported on the mpz field
+            continue
+        for name in ("_add", "_madd", "_mmadd", "_double", "_mdouble"):
+            benchmark(f"formula.{coordinates}.{field}.{name}")(_formula(name, coordinates, field))
+        benchmark(f"scalar_mul.{coordinates}.{field}.wnaf")(_scalar_mul(coordinates, field))
+        benchmark(f"scalar_mul.{coordinates}.{field}.fixed_base")(_scalar_mul(coordinates, field, fixed_base=True))
+for batch in (1, 10, 100, 1000, 10000):
+    benchmark(f"normalise_queue.{batch}")(_normalise_queue(batch))
+benchmark("bsgs.baby_steps")(_baby_steps())
+benchmark("bsgs.giant_steps", repeats=3)(_giant_steps())
+benchmark("rho.parallel_rho", repeats=3)(_rho())
+benchmark("dlog.easy", repeats=3)(_dlog(easy))
+benchmark("dlog.medium", repeats=3)(_dlog(medium))
+benchmark("dlog.hard", slow=True, warmup=0, repeats=1)(_dlog(hard))
+
+
+def _format(seconds):
+    if seconds >= 1:
+        return f"{seconds:.3f}s"
+    if seconds >= 10 ** -3:
+        return f"{seconds * 10**3:.3f}ms"
+    return f"{seconds * 10**6:.3f}us"
+
+
+def measure(name):
+    """
+    Median and minimum seconds per operation of a benchmark
+    """
+    setup, _, warmup, repeats = BENCHMARKS[name]
+    seed(SEED)
+    run, ops, *prepare = setup()
+    prepare = prepare[0] if prepare else (lambda: None)
+    for _ in range(warmup):
+        seed(SEED)
+        prepare()
+        run()
+    times = []
+    for _ in range(repeats):
+        seed(SEED)
+        prepare()
+        s = time.perf_counter()
+        run()
+        times.append((time.perf_counter() - s) / ops)
+    times.sort()
+    return {"seconds": times[len(times) // 2], "min": times[0], "ops": ops, "repeats": repeats}
+
+
+def run_benchmarks(names):
+    results = {}
+    for name in names:
+        print(f"{name} -> ", end="", flush=True)
+        result = measure(name)
+        results[name] = result
+        print(_format(result["seconds"]))
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "gmpy2": gmpy2.version(),
+            "seed": SEED,
+            "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Print every benchmark against the baseline and
+    return the names slower by more than `tolerance`
+    """
+    regressions = []
+    old = baseline["results"]
+    for name, result in results["results"].items():
+        if name not in old:
+            continue
+        ratio = result["min"] / old[name]["min"]
+        if ratio > 1 + tolerance:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif ratio < 1 / (1 + tolerance):
+            status = "faster"
+        else:
+            status = "ok"
+        print(f"{name:>45} {_format(old[name]['min']):>12} {_format(result['min']):>12} {ratio:>6.2f}x  {status}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks with fixed seeds, JSON output and baseline comparison")
+    parser.add_argument("filter", nargs="*", help="only run benchmarks whose name contains one of these")
+    parser.add_argument("--all", action="store_true", help="include the slow benchmarks")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--baseline", default=BASELINE, help="results to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    names = [name for name, (_, slow, _, _) in BENCHMARKS.items()
+             if (args.all or not slow) and (not args.filter or any(f in name for f in args.filter))]
+    results = run_benchmarks(names)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regressions over {args.tolerance:.0%}: {', '.join(regressions)}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+from hashlib import sha256
+from time import perf_counter
+import os
+import pickle
+import zlib
+from gmpy2 import mpz
+from point import EllipticCurvePoint
+
+# File layout: magic, then the zlib compressed pickle
+# of a dict from keys to solver states
+CHECKPOINT_MAGIC = b"ECCKPT01"
+
+# Seconds between saves of a solver's state
+CHECKPOINT_EVERY = 60
+
+
+class Checkpoint:
+    """
+    Solver states, loaded from `path` if it exists and
+    saved back to it at most every `every` seconds.
+
+    States hold plain ints, tuples, lists and dicts, with
+    points as their affine coordinates, so a checkpoint
+    does not depend on the field backend and resumes
+    with any of them.
+    """
+
+    def __init__(self, path, every=CHECKPOINT_EVERY):
+        self.path = path
+        self.every = every
+        self.states = {}
+        self._saved = perf_counter()
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = f.read()
+            if data[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC:
+                raise ValueError(f"{path} is not a checkpoint file")
+            self.states = pickle.loads(zlib.decompress(data[len(CHECKPOINT_MAGIC):]))
+
+    @staticmethod
+    def key(name, *values):
+        """
+        Key of a solve from the solver's name and its
+        inputs, points include their curve
+        """
+        parts = [name]
+        for v in values:
+            if isinstance(v, EllipticCurvePoint):
+                E = v.curve
+                parts.append(tuple(int(c) for c in (E.q, E.a, E.b, *v.to_tuple())))
+            else:
+                parts.append(int(v))
+        return sha256(repr(parts).encode()).hexdigest()[:32]
+
+    def get(self, key, default=None):
+        return self.states.get(key, default)
+
+    def set(self, key, state):
+        self.states[key] = _plain(state)
+
+    def pop(self, *keys):
+        """
+        Remove the states of finished solves, saving
+        when any of them was held
+        """
+        if any([self.states.pop(key, None) is not None for key in keys]):
+            self.save()
+
+    def due(self):
+        return perf_counter() - self._saved >= self.every
+
+    def save(self):
+        """
+        Write every state, replacing the file only
+        once the new one is complete
+        """
+        data = CHECKPOINT_MAGIC + zlib.compress(pickle.dumps(self.states, pickle.HIGHEST_PROTOCOL))
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self.path)
+        self._saved = perf_counter()
+
+
+def _plain(state):
+    """
+    state with every integer as a plain int, so no
+    mpz is pickled into the file
+    """
+    if isinstance(state, (tuple, list)):
+        return type(state)(_plain(v) for v in state)
+    if isinstance(state, dict):
+        return {_plain(k): _plain(v) for k, v in state.items()}
+    if isinstance(state, mpz):
+        return int(state)
+    return state
+
+
+def point_from_tuple(E, key):
+    """
+    Point of E from to_tuple(), which is
+    (-1, -1) for the point at infinity
+    """
+    if key == (-1, -1):
+        return E.O.copy()
+    return E(*key)
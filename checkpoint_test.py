@@ -0,0 +1,75 @@
+import random
+import zlib
+import pytest
+from checkpoint import Checkpoint, CHECKPOINT_MAGIC
+from discrete_log import bsgs, discrete_log_rho, discrete_log_kangaroo, pohlig_hellman
+from tables import BabyStepCache
+from projective_ecdlp_test import easy, hard, challenge, subgroup
+
+
+class Killed(Exception):
+    pass
+
+
+class KilledCheckpoint(Checkpoint):
+    """
+    Checkpoint saving on every chance, which stops
+    the solve like a kill once `saves` are written
+    """
+
+    def __init__(self, path, saves):
+        super().__init__(path, every=0)
+        self.saves = saves
+
+    def save(self):
+        super().save()
+        self.saves -= 1
+        if self.saves == 0:
+            raise Killed
+
+
+def saved_states(path):
+    with open(path, "rb") as f:
+        data = zlib.decompress(f.read()[len(CHECKPOINT_MAGIC):])
+    # States are plain ints, never mpz
+    assert b"gmpy2" not in data
+    return Checkpoint(path).states
+
+
+def resume(path, solve, saves):
+    with pytest.raises(Killed):
+        solve(KilledCheckpoint(path, saves))
+    assert saved_states(path)
+    d = solve(Checkpoint(path, every=0))
+    # Nothing is left once the solve is finished
+    assert saved_states(path) == {}
+    return d
+
+
+def test_bsgs_resume(tmp_path, data=easy, pi=729196241):
+    G = subgroup(data, pi)
+    d = pi - 12345
+    solve = lambda checkpoint: bsgs(G, d * G, data['n'], upper_bound=pi, cache=BabyStepCache(), checkpoint=checkpoint)
+    assert resume(str(tmp_path / "bsgs.ckpt"), solve, saves=3) == d
+
+
+def test_rho_resume(tmp_path, data=hard, pi=12490680737):
+    random.seed(0)
+    G = subgroup(data, pi)
+    d = random.randrange(pi)
+    solve = lambda checkpoint: discrete_log_rho(G, d * G, data['n'], upper_bound=pi, checkpoint=checkpoint)
+    assert resume(str(tmp_path / "rho.ckpt"), solve, saves=2) == d
+
+
+def test_pohlig_hellman_resume(tmp_path, data=easy):
+    _, P, Q = challenge(data)
+    solve = lambda checkpoint: pohlig_hellman(P, Q, data['n'], data['n_factors'], checkpoint=checkpoint)
+    assert resume(str(tmp_path / "ph.ckpt"), solve, saves=8) == data['d']
+
+
+def test_solver_without_checkpoint(tmp_path, data=easy):
+    # Only dlogs taking a checkpoint are passed one
+    _, P, Q = challenge(data)
+    checkpoint = Checkpoint(str(tmp_path / "kangaroo.ckpt"))
+    assert pohlig_hellman(P, Q, data['n'], data['n_factors'], dlog=discrete_log_kangaroo, checkpoint=checkpoint) == data['d']
+    assert saved_states(checkpoint.path) == {}
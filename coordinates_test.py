@@ -0,0 +1,39 @@
+import time
+from curve import EllipticCurve, COORDINATES
+from discrete_log import pohlig_hellman, baby_step_cache
+from projective_ecdlp_test import medium, hard
+
+
+def benchmark_scalar_mul(coordinates, data=hard, samples=100):
+    # average time of d*P on the challenge curve
+    E = EllipticCurve(data['p'], data['a'], data['b'], coordinates=coordinates)
+    P = E(data['Px'], data['Py'])
+    s = time.time()
+    for _ in range(samples):
+        data['d'] * P
+    return (time.time() - s) / samples
+
+
+def benchmark_bsgs(coordinates, data=medium, check_times=3):
+    # average time of a full dlog, rebuilding the baby steps each time
+    E = EllipticCurve(data['p'], data['a'], data['b'], coordinates=coordinates)
+    P = E(data['Px'], data['Py'])
+    Q = E(data['Qx'], data['Qy'])
+    total_time = 0
+    for _ in range(check_times):
+        baby_step_cache.clear()
+        s = time.time()
+        assert pohlig_hellman(P, Q, data['n'], data['n_factors']) == data['d']
+        total_time += time.time() - s
+    return total_time / check_times
+
+
+def main():
+    for coordinates in COORDINATES:
+        print(f'{coordinates}:')
+        print(f'  scalar mul  -> {benchmark_scalar_mul(coordinates) * 10**3:.3f}ms')
+        print(f'  medium dlog -> {benchmark_bsgs(coordinates):.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,24 +1,98 @@
 from math import log2, floor
-from point import EllipticCurvePoint
+from point import EllipticCurvePoint, MontgomeryFormPoint, JacobianPoint, straus, pippenger
+from field import FIELDS, PrimeField
 from gmpy2 import mpz
 
 
+# Coordinate systems for points on the curve
+COORDINATES = ("projective", "jacobian")
+
+# multi_scalar_mul uses Straus up to this many
+# terms and Pippenger's buckets above
+STRAUS_TERMS = 64
+
+
 class EllipticCurve:
     """
     General Weierstrass curve 
-    defined using projctive coordinates
+    defined using projctive coordinates,
+    or optionally Jacobian coordinates
     """
 
-    def __init__(self, q, a, b):
+    def __init__(self, q, a, b, field=PrimeField.name, coordinates="projective"):
         """
         Initalise Elliptic Curve
         in Weierstrass form
         y^2 = x^3 + ax + b mod q
+
+        `field` picks the arithmetic backend, see FIELDS
+
+        `coordinates` is "projective" (x/z, y/z) or
+        "jacobian" (x/z^2, y/z^3)
         """
+        if coordinates not in COORDINATES:
+            raise ValueError(f"Unknown coordinate system {coordinates}, expected one of {COORDINATES}")
         self.point = EllipticCurvePoint
         self.a = mpz(a)
         self.b = mpz(b)
         self.q = mpz(q)
+
+        self.field = FIELDS[field](self.q)
+        # Normalised points have z == one, which is
+        # R mod q for Montgomery form residues
+        self.one = self.field.one
+
+        if self.one != 1:
+            # Projective coordinates scaled by R are the same
+            # point, so residues only change how we multiply
+            self.point = MontgomeryFormPoint
+
+        # Doubling formula in use, a = -3 and a = 0
+        # save the multiplication by a
+        self.coordinates = coordinates
+        self.doubling = "dbl-2007-bl"
+        if coordinates == "jacobian":
+            # Scaling by R is not the same Jacobian point,
+            # so only the mpz field is supported
+            if type(self.field) is not PrimeField:
+                raise ValueError(f"Jacobian coordinates are not supported with the {field} field")
+            self.point = JacobianPoint
+            self._is_on_curve = self._jacobian_is_on_curve
+            self._add = self._jacobian_add
+            self._madd = self._jacobian_madd
+            self._imadd = self._jacobian_imadd
+            self._mmadd = self._jacobian_mmadd
+            self._double = self._jacobian_double
+            self._mdouble = self._jacobian_mdouble
+            if self.a == self.q - 3:
+                self.doubling = "dbl-2001-b"
+                self._double = self._jacobian_double_a3
+            elif self.a == 0:
+                self.doubling = "dbl-2009-l"
+                self._double = self._jacobian_double_a0
+        elif type(self.field) is not PrimeField:
+            # Every product is reduced by the field
+            self._a = self.field.to_field(self.a)
+            self._add = self._field_add
+            self._madd = self._field_madd
+            self._imadd = self._field_imadd
+            self._mmadd = self._field_mmadd
+            self._double = self._field_double
+            self._mdouble = self._field_mdouble
+        elif self.a == self.q - 3:
+            self.doubling = "dbl-2007-bl-a3"
+            self._double = self._double_a3
+        elif self.a == 0:
+            self.doubling = "dbl-2007-bl-a0"
+            self._double = self._double_a0
+            self._mdouble = self._mdouble_a0
+
+        # wNAF window width for scalar multiplication,
+        # None picks one from the size of the scalar
+        self.window = None
+        # Operation counts, see instrument.py
+        self.counters = None
+
         self.O = self.point(self, 0, 1, 0, check=False)
 
         if self.determinant() == 0:
@@ -48,6 +122,32 @@ class EllipticCurve:
         """
         return -1728 * ((4 * self.a) ** 3 * pow(self.determinant(), -1, self.q)) % self.q
 
+    def multi_scalar_mul(self, points, scalars):
+        """
+        Computes sum(n*P) for P, n in zip(points, scalars)
+        with one shared run of doublings, so a*P + b*Q
+        costs about as much as a single multiplication.
+        Points carrying a fixed base table use it instead.
+        """
+        R = self.O
+        terms = []
+        for P, n in zip(points, scalars):
+            if n == 0 or P.is_inf():
+                continue
+            if P.fixed_base is not None:
+                R = R + P.fixed_base.mul(n)
+            elif n < 0:
+                terms.append((-P, -n))
+            else:
+                terms.append((P, n))
+        if terms:
+            points, scalars = zip(*terms)
+            if len(terms) <= STRAUS_TERMS:
+                R = R + straus(points, scalars)
+            else:
+                R = R + pippenger(points, scalars)
+        return R.normalise_coordinates()
+
     def _neg(self, P):
         """
         Return -P
@@ -89,6 +189,28 @@ class EllipticCurve:
         z3 = (vvv * P.z) % self.q
         return self.point(self, x3, y3, z3, check=False)
 
+    def _imadd(self, P, Q):
+        """
+        P += Q in place for Q with z == one. Returns False
+        and leaves P untouched when P == +-Q, where the
+        formula gives z == 0 and __add__ must decide
+        """
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-projective.html#addition-madd-1998-cmo
+        v = (Q.x * P.z - P.x) % self.q
+        if not v:
+            return False
+        u = (Q.y * P.z - P.y)
+        uu = (u * u)
+        vv = (v * v)
+        vvv = (v * vv)
+        r = (vv * P.x)
+        a = (uu * P.z - vvv - 2 * r)
+        # New coordinates, now take modulus
+        P.y = (u * (r - a) - vvv * P.y) % self.q
+        P.x = (v * a) % self.q
+        P.z = (vvv * P.z) % self.q
+        return True
+
     def _mmadd(self, P, Q):
         # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-projective.html#addition-mmadd-1998-cmo
         u = (Q.y - P.y)
@@ -143,8 +265,335 @@ class EllipticCurve:
         z3 = sss % self.q
         return self.point(self, x3, y3, z3, check=False)
 
+    def _double_a3(self, P):
+        if P.y == 0:
+            return self.O
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-projective-3.html#doubling-dbl-2007-bl
+        # a = -3 so w = 3*(X1 - Z1)*(X1 + Z1)
+        w = (3 * (P.x - P.z) * (P.x + P.z))
+        s = (2 * P.y * P.z)
+        ss = (s * s)
+        sss = (s * ss)
+        r = (P.y * s)
+        rr = (r * r)
+        b = (2 * P.x * r)
+        h = (pow(w, 2, self.q) - 2 * b)
+        # New coordinates, now take modulus
+        x3 = (h * s) % self.q
+        y3 = (w * (b - h) - 2 * rr) % self.q
+        z3 = sss % self.q
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _double_a0(self, P):
+        if P.y == 0:
+            return self.O
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-projective.html#doubling-dbl-2007-bl
+        # a = 0 so w = 3*XX
+        xx = (P.x * P.x)
+        w = (3 * xx)
+        s = (2 * P.y * P.z)
+        ss = (s * s)
+        sss = (s * ss)
+        r = (P.y * s)
+        rr = (r * r)
+        b = (pow(P.x + r, 2, self.q) - xx - rr)
+        h = (pow(w, 2, self.q) - 2 * b)
+        # New coordinates, now take modulus
+        x3 = (h * s) % self.q
+        y3 = (w * (b - h) - 2 * rr) % self.q
+        z3 = sss % self.q
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _mdouble_a0(self, P):
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-projective.html#doubling-mdbl-2007-bl
+        # a = 0 so w = 3*XX
+        if P.y == 0:
+            return self.O
+        xx = (P.x * P.x)
+        w = (3 * xx)
+        yy = (P.y * P.y)
+        r = (2 * yy)
+        sss = (4 * P.y * r)
+        rr = (r * r)
+        b = (pow(P.x + r, 2, self.q) - xx - rr)
+        h = (pow(w, 2, self.q) - 2 * b)
+        # New coordinates, now take modulus
+        x3 = (2 * h * P.y) % self.q
+        y3 = (w * (b - h) - 2 * rr) % self.q
+        z3 = sss % self.q
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _jacobian_is_on_curve(self, x, y, z=1):
+        """
+        Is on curve (x,y,z) in Jacobian coordinates?
+        """
+        zz = z ** 2
+        return (y ** 2) % self.q == (x ** 3 + self.a * x * zz ** 2 + self.b * zz ** 3) % self.q
+
+    def _jacobian_add(self, P, Q):
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-jacobian.html#addition-add-2007-bl
+        z1z1 = (P.z * P.z)
+        z2z2 = (Q.z * Q.z)
+        u1 = (P.x * z2z2)
+        u2 = (Q.x * z1z1)
+        s1 = (P.y * Q.z * z2z2)
+        s2 = (Q.y * P.z * z1z1)
+        h = (u2 - u1) % self.q
+        i = (4 * h * h)
+        j = (h * i)
+        r = (2 * (s2 - s1)) % self.q
+        v = (u1 * i) % self.q
+        # New coordinates, now take modulus
+        x3 = (r * r - j - 2 * v) % self.q
+        y3 = (r * (v - x3) - 2 * s1 * j) % self.q
+        z3 = (2 * P.z * Q.z * h) % self.q
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _jacobian_madd(self, P, Q):
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-jacobian.html#addition-madd-2007-bl
+        z1z1 = (P.z * P.z)
+        u2 = (Q.x * z1z1)
+        s2 = (Q.y * P.z * z1z1)
+        h = (u2 - P.x) % self.q
+        hh = (h * h)
+        i = (4 * hh)
+        j = (h * i)
+        r = (2 * (s2 - P.y)) % self.q
+        v = (P.x * i) % self.q
+        # New coordinates, now take modulus
+        x3 = (r * r - j - 2 * v) % self.q
+        y3 = (r * (v - x3) - 2 * P.y * j) % self.q
+        z3 = (2 * P.z * h) % self.q
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _jacobian_imadd(self, P, Q):
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-jacobian.html#addition-madd-2007-bl
+        z1z1 = (P.z * P.z)
+        u2 = (Q.x * z1z1)
+        h = (u2 - P.x) % self.q
+        if not h:
+            return False
+        s2 = (Q.y * P.z * z1z1)
+        hh = (h * h)
+        i = (4 * hh)
+        j = (h * i)
+        r = (2 * (s2 - P.y)) % self.q
+        v = (P.x * i) % self.q
+        # New coordinates, now take modulus
+        x3 = (r * r - j - 2 * v) % self.q
+        P.y = (r * (v - x3) - 2 * P.y * j) % self.q
+        P.x = x3
+        P.z = (2 * P.z * h) % self.q
+        return True
+
+    def _jacobian_mmadd(self, P, Q):
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-jacobian.html#addition-mmadd-2007-bl
+        h = (Q.x - P.x)
+        hh = (h * h)
+        i = (4 * hh)
+        j = (h * i)
+        r = (2 * (Q.y - P.y))
+        v = (P.x * i) % self.q
+        # New coordinates, now take modulus
+        x3 = (r * r - j - 2 * v) % self.q
+        y3 = (r * (v - x3) - 2 * P.y * j) % self.q
+        z3 = (2 * h) % self.q
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _jacobian_double(self, P):
+        if P.y == 0:
+            return self.O
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-jacobian.html#doubling-dbl-2007-bl
+        xx = (P.x * P.x)
+        yy = (P.y * P.y) % self.q
+        yyyy = (yy * yy)
+        zz = (P.z * P.z) % self.q
+        s = (4 * P.x * yy) % self.q
+        m = (3 * xx + self.a * zz * zz) % self.q
+        t = (m * m - 2 * s) % self.q
+        # New coordinates, now take modulus
+        x3 = t
+        y3 = (m * (s - t) - 8 * yyyy) % self.q
+        z3 = (2 * P.y * P.z) % self.q
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _jacobian_double_a3(self, P):
+        if P.y == 0:
+            return self.O
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-jacobian-3.html#doubling-dbl-2001-b
+        delta = (P.z * P.z)
+        gamma = (P.y * P.y) % self.q
+        beta = (P.x * gamma) % self.q
+        alpha = (3 * (P.x - delta) * (P.x + delta)) % self.q
+        # New coordinates, now take modulus
+        x3 = (alpha * alpha - 8 * beta) % self.q
+        y3 = (alpha * (4 * beta - x3) - 8 * gamma * gamma) % self.q
+        z3 = (2 * P.y * P.z) % self.q
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _jacobian_double_a0(self, P):
+        if P.y == 0:
+            return self.O
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-jacobian-0.html#doubling-dbl-2009-l
+        a = (P.x * P.x)
+        b = (P.y * P.y) % self.q
+        c = (b * b)
+        d = (4 * P.x * b) % self.q
+        e = (3 * a) % self.q
+        # New coordinates, now take modulus
+        x3 = (e * e - 2 * d) % self.q
+        y3 = (e * (d - x3) - 8 * c) % self.q
+        z3 = (2 * P.y * P.z) % self.q
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _jacobian_mdouble(self, P):
+        if P.y == 0:
+            return self.O
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-jacobian.html#doubling-mdbl-2007-bl
+        xx = (P.x * P.x)
+        yy = (P.y * P.y) % self.q
+        yyyy = (yy * yy)
+        s = (4 * P.x * yy) % self.q
+        m = (3 * xx + self.a) % self.q
+        t = (m * m - 2 * s) % self.q
+        # New coordinates, now take modulus
+        x3 = t
+        y3 = (m * (s - t) - 8 * yyyy) % self.q
+        z3 = (2 * P.y) % self.q
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _field_add(self, P, Q):
+        # add-1998-cmo-2 with every product reduced by the field
+        mul, q = self.field.mul, self.q
+        y1z2 = mul(P.y, Q.z)
+        x1z2 = mul(P.x, Q.z)
+        z1z2 = mul(P.z, Q.z)
+        u = (mul(Q.y, P.z) - y1z2) % q
+        v = (mul(Q.x, P.z) - x1z2) % q
+        uu = mul(u, u)
+        vv = mul(v, v)
+        vvv = mul(v, vv)
+        r = mul(vv, x1z2)
+        a = (mul(uu, z1z2) - vvv - 2 * r) % q
+        x3 = mul(v, a)
+        y3 = (mul(u, (r - a) % q) - mul(vvv, y1z2)) % q
+        z3 = mul(vvv, z1z2)
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _field_madd(self, P, Q):
+        # madd-1998-cmo with every product reduced by the field
+        mul, q = self.field.mul, self.q
+        u = (mul(Q.y, P.z) - P.y) % q
+        v = (mul(Q.x, P.z) - P.x) % q
+        uu = mul(u, u)
+        vv = mul(v, v)
+        vvv = mul(v, vv)
+        r = mul(vv, P.x)
+        a = (mul(uu, P.z) - vvv - 2 * r) % q
+        x3 = mul(v, a)
+        y3 = (mul(u, (r - a) % q) - mul(vvv, P.y)) % q
+        z3 = mul(vvv, P.z)
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _field_imadd(self, P, Q):
+        # madd-1998-cmo with every product reduced by the field
+        mul, q = self.field.mul, self.q
+        v = (mul(Q.x, P.z) - P.x) % q
+        if not v:
+            return False
+        u = (mul(Q.y, P.z) - P.y) % q
+        uu = mul(u, u)
+        vv = mul(v, v)
+        vvv = mul(v, vv)
+        r = mul(vv, P.x)
+        a = (mul(uu, P.z) - vvv - 2 * r) % q
+        P.y = (mul(u, (r - a) % q) - mul(vvv, P.y)) % q
+        P.x = mul(v, a)
+        P.z = mul(vvv, P.z)
+        return True
+
+    def _field_mmadd(self, P, Q):
+        # mmadd-1998-cmo with every product reduced by the field
+        mul, q = self.field.mul, self.q
+        u = (Q.y - P.y) % q
+        v = (Q.x - P.x) % q
+        uu = mul(u, u)
+        vv = mul(v, v)
+        vvv = mul(v, vv)
+        r = mul(vv, P.x)
+        a = (uu - vvv - 2 * r) % q
+        x3 = mul(v, a)
+        y3 = (mul(u, (r - a) % q) - mul(vvv, P.y)) % q
+        z3 = vvv
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _field_double(self, P):
+        if P.y == 0:
+            return self.O
+        # dbl-2007-bl with every product reduced by the field
+        mul, q = self.field.mul, self.q
+        xx = mul(P.x, P.x)
+        zz = mul(P.z, P.z)
+        w = (mul(self._a, zz) + 3 * xx) % q
+        s = 2 * mul(P.y, P.z) % q
+        ss = mul(s, s)
+        sss = mul(s, ss)
+        r = mul(P.y, s)
+        rr = mul(r, r)
+        t = (P.x + r) % q
+        b = (mul(t, t) - xx - rr) % q
+        h = (mul(w, w) - 2 * b) % q
+        x3 = mul(h, s)
+        y3 = (mul(w, (b - h) % q) - 2 * rr) % q
+        z3 = sss
+        return self.point(self, x3, y3, z3, check=False)
+
+    def _field_mdouble(self, P):
+        if P.y == 0:
+            return self.O
+        # mdbl-2007-bl with every product reduced by the field
+        mul, q = self.field.mul, self.q
+        xx = mul(P.x, P.x)
+        w = (self._a + 3 * xx) % q
+        yy = mul(P.y, P.y)
+        r = 2 * yy % q
+        sss = 4 * mul(P.y, r) % q
+        rr = mul(r, r)
+        t = (P.x + r) % q
+        b = (mul(t, t) - xx - rr) % q
+        h = (mul(w, w) - 2 * b) % q
+        x3 = 2 * mul(h, P.y) % q
+        y3 = (mul(w, (b - h) % q) - 2 * rr) % q
+        z3 = sss
+        return self.point(self, x3, y3, z3, check=False)
+
     def __repr__(self):
-        return f"EllipticCurve({self.q}, {self.a}, {self.b})"
+        options = ""
+        if type(self.field) is not PrimeField:
+            options += f", field='{self.field.name}'"
+        if self.coordinates != "projective":
+            options += f", coordinates='{self.coordinates}'"
+        return f"EllipticCurve({self.q}, {self.a}, {self.b}{options})"
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+        if isinstance(other, EllipticCurve):
+            return self._invariants() == other._invariants()
+        return False
+
+    def __hash__(self):
+        return hash((self.q, self.a, self.b))
+
+    def _invariants(self):
+        return (self.q, self.a, self.b, self.field.name, self.coordinates)
+
+    def __reduce__(self):
+        """
+        Pickle only the invariants, the rest
+        is rebuilt on load
+        """
+        return (self.__class__, self._invariants())
 
     def __call__(self, x, y, z=1):
         """
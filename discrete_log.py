@@ -1,123 +1,379 @@
-from math import ceil, sqrt, gcd
+from math import ceil, sqrt, gcd, isqrt
+from contextlib import nullcontext
 from functools import reduce
+from inspect import signature
+from multiprocessing import Pool
 import random
+from point import normalise_queue, normalise_all, batch_iadd_affine
+from tables import BabyStepTable, BabyStepCache
+from checkpoint import point_from_tuple
+from vector import VectorField, PointBatch, np
 
+# Pollard rho, number of r-adding walk steps
+# and collision memory slots
+PARTITION = 20
+MEMORY = 4
 
-def normalise_queue(queue):
-    # optimise for non-zero inverses
-    # optimise for our use case by generators
-    # NOTE: 1-index prefix for optimization
-    q = queue[0].curve.q
-    n = len(queue)
-    z_prod = 1
-    prefix = [1] * (n + 1)
-    for i, P in enumerate(queue):
-        z_prod = z_prod * P.z % q
-        prefix[i + 1] = prefix[i] * P.z % q
-    z_prod_inverse = pow(z_prod, -1, q)
-    # i = n - 1 separate
-    P = queue[n - 1]
-    cur_suffix = P.z
-    P.x = P.x * prefix[n - 1] * z_prod_inverse % q
-    P.y = P.y * prefix[n - 1] * z_prod_inverse % q
-    P.z = 1
-    yield P
-    # 0 <= i <= n - 2
-    for i in range(n - 2, -1, -1):
-        P = queue[i]
-        z = P.z
-        cur_inverse = prefix[i] * cur_suffix * z_prod_inverse % q
-        cur_suffix = cur_suffix * z % q
-        P.x = P.x * cur_inverse % q
-        P.y = P.y * cur_inverse % q
-        P.z = 1
-        yield P
-
-
-def bsgs(P, Q, n, upper_bound=None, batched=True):
+# Baby step tables shared by every bsgs call,
+# keyed by (curve, generator, m)
+baby_step_cache = BabyStepCache()
+
+# Giant steps per block, each block is normalised
+# with one inversion and probed together. Chosen
+# with the sweep in normalise_queue_test.py.
+GIANT_STEP_BLOCK = 128
+
+# bsgs_batch steps at least this many targets as
+# one PointBatch when numpy is available. Wider
+# fields need more limbs and lose to gmpy2.
+VECTOR_TARGETS = 16384
+VECTOR_MAX_BITS = 140
+
+
+def baby_steps(P, start, stop, batch=100):
+    """
+    Yield (i, i*P) for start <= i < stop, normalising
+    the points in batches with a single inversion each
+    """
+    index, queue = [], []
+    Pi = start * P
+    for i in range(start, stop):
+        if Pi.z == 0:
+            yield i, Pi
+        else:
+            index.append(i)
+            queue.append(Pi)
+            if len(queue) >= batch or i == stop - 1:
+                # NOTE: normalise_queue returns generator in reversed order
+                queue = normalise_queue(queue)
+                for j, Pj in zip(reversed(index), queue):
+                    yield j, Pj
+                index, queue = [], []
+        Pi += P
+
+
+def build_baby_steps(P, m, start=1, stop=None):
+    """
+    Fingerprint table of the baby steps i*P
+    for start <= i < stop, by default covering
+    +-i*P for all 0 < i < m
+    """
+    if stop is None:
+        stop = m // 2 + 1
+    pairs = ((Pi.x, i) for i, Pi in baby_steps(P, start, stop) if not Pi.is_inf())
+    table = BabyStepTable.from_pairs(P, m, pairs)
+    if P.curve.counters is not None:
+        P.curve.counters.count("tables")
+        P.curve.counters.count("table_entries", len(table))
+    return table
+
+
+def giant_step_match(table, Qi, j):
+    """
+    Return j*m + i if Qi == i*P is in the table,
+    where Qi = Q - j*m*P
+    """
+    if Qi.is_inf():
+        return j * table.m
+    i = table.lookup(Qi.normalise_coordinates())
+    # A negative index on the first giant step would
+    # give a negative logarithm, the same solution is
+    # met again as a positive one on a later step
+    if i is None or (j == 0 and i < 0):
+        return None
+    return j * table.m + i
+
+
+def giant_steps(Q, C, steps, block=GIANT_STEP_BLOCK):
+    """
+    Yield (j, points) with points[c] == Q + (j + c)*C for
+    the giant steps 0 <= j + c < steps, in blocks of
+    normalised points. Block c holds a chain of steps c
+    mod `block` advanced by affine additions, so each
+    block costs one inversion. The points are updated in
+    place when the next block is requested.
+    """
+    k = min(block, steps)
+    if k <= 0:
+        return
+    # Stepped in place, leave Q alone
+    heads = [Q.copy()]
+    for _ in range(k - 1):
+        heads.append(heads[-1].copy().iadd_affine(C))
+    normalise_all([Qi for Qi in heads if not Qi.is_inf()])
+    stride = [k * C] * k
+
+    for j in range(0, steps, k):
+        yield j, heads[:steps - j]
+        batch_iadd_affine(heads, stride)
+
+
+def giant_step_block(table, points, js):
+    """
+    Yield (k, d) for every points[k] matching the table
+    as giant step js[k], in order of k. The block is
+    probed in bulk, see giant_step_match.
+    """
+    hits = dict(table.lookup_many(points))
+    for k, Qi in enumerate(points):
+        if Qi.is_inf():
+            yield k, js[k] * table.m
+            continue
+        i = hits.get(k)
+        if i is None or (js[k] == 0 and i < 0):
+            continue
+        yield k, js[k] * table.m + i
+
+
+def bsgs(P, Q, n, upper_bound=None, batched=True, cache=baby_step_cache, block=GIANT_STEP_BLOCK, checkpoint=None):
+    """
+    Baby step giant step. With a Checkpoint the giant
+    step reached is saved, and a cache with a directory
+    keeps the baby steps for a resumed solve.
+    """
     if upper_bound:
         m = ceil(sqrt(upper_bound))
     else:
         m = ceil(sqrt(n))
 
-    if not hasattr(bsgs, 'baby_steps'):
-        baby_steps = dict()
-        index, queue = [], []
-        Pi = P.curve.O
-        for i in range(m):
-            if Pi == Q:
-                return i
-            if Pi.z == 0:
-                baby_steps[Pi] = i
-            else:
-                index.append(i)
-                queue.append(Pi)
-                if len(queue) >= 100 or i == m - 1:
-                    # NOTE: normalise_queue returns generator in reversed order
-                    queue = normalise_queue(queue)
-                    for j, Pj in zip(reversed(index), queue):
-                        baby_steps[Pj] = j
-                    index, queue = [], []
-            Pi += P
-        # update attribute at the end
-        bsgs.baby_steps = baby_steps
+    table = cache.get_or_build(P, m, build_baby_steps)
 
     C = (m * (n - 1)) * P
-    Qi = Q
-    # giant steps
-    for j in range(m):
-        if Qi in bsgs.baby_steps:
-            return j * m + bsgs.baby_steps[Qi]
-        Qi += C
+    j0 = 0
+    if checkpoint is not None:
+        key = checkpoint.key("bsgs", P, Q, m)
+        j0 = checkpoint.get(key, 0)
+    # Resume from Q + j0*C
+    start = P.curve.multi_scalar_mul((Q, C), (1, j0)) if j0 else Q
+
+    # giant steps, the half size table means
+    # solutions (j+1)*m - i are met on step j+1.
+    # Blocks come in order of j, the first hit
+    # has the smallest j.
+    for j, points in giant_steps(start, C, m + 1 - j0, block):
+        j += j0
+        for _, d in giant_step_block(table, points, range(j, j + len(points))):
+            if checkpoint is not None:
+                checkpoint.pop(key)
+            return d
+        if checkpoint is not None and checkpoint.due():
+            checkpoint.set(key, j + len(points))
+            checkpoint.save()
+    if checkpoint is not None:
+        checkpoint.pop(key)
     # No solution
     # raise Exception(f"No solution found\nP = {P}\nQ = {Q}\nm, n = {m, n}\nupper_bound = {upper_bound}")
     return None
 
 
-def discrete_log_rho(P, Q, n, upper_bound=None):
-    PARTITION = 20
-    MEMORY = 4
+def discrete_log_trial(P, Q, n, upper_bound=None):
+    """
+    Compare Q with i*P for 0 <= i < upper_bound in
+    turn, for the smallest primes where building a
+    table costs more than the search
+    """
+    if Q.is_inf():
+        return 0
+    Q = Q.copy().normalise_coordinates()
+    for i, Pi in baby_steps(P, 1, upper_bound or n):
+        if not Pi.is_inf() and Pi.x == Q.x and Pi.y == Q.y:
+            return i
+    # No solution
+    return None
+
 
+def bsgs_batch(P, Qs, n, upper_bound=None, cache=baby_step_cache):
+    """
+    bsgs for many targets against one P, the giant
+    steps of every target advance together as affine
+    additions sharing one inversion per step.
+
+    Yields (k, d) with Qs[k] == d*P as each target is
+    solved, then (k, None) for any left unsolved.
+    """
     if upper_bound:
         m = ceil(sqrt(upper_bound))
     else:
         m = ceil(sqrt(n))
 
-    # setup to costly, use bsgs
+    table = cache.get_or_build(P, m, build_baby_steps)
+
+    C = (m * (n - 1)) * P
+    E = P.curve
+    vectorise = len(Qs) >= VECTOR_TARGETS and E.q.bit_length() <= VECTOR_MAX_BITS
+    if np is not None and vectorise and E.one == 1 and E.coordinates == "projective":
+        yield from _vector_giant_steps(table, Qs, C)
+        return
+
+    # Stepped in place, leave Qs alone
+    pending = {k: Q.copy() for k, Q in enumerate(Qs)}
+    normalise_all([Qi for Qi in pending.values() if not Qi.is_inf()])
+    for j in range(m + 1):
+        keys, heads = list(pending), list(pending.values())
+        for t, d in giant_step_block(table, heads, [j] * len(heads)):
+            del pending[keys[t]]
+            yield keys[t], d
+        if not pending:
+            return
+        heads = list(pending.values())
+        batch_iadd_affine(heads, [C] * len(heads))
+    # No solution
+    for k in pending:
+        yield k, None
+
+
+def _vector_giant_steps(table, Qs, C):
+    """
+    The giant steps of bsgs_batch with all targets held
+    in one PointBatch. Each step is one batched madd and
+    normalisation, and the table is probed for the whole
+    batch with one searchsorted. Only fingerprint hits
+    and the rare P == +-C additions leave the batch.
+    """
+    E = C.curve
+    m = table.m
+    keys = []
+    for k, Q in enumerate(Qs):
+        if Q.is_inf():
+            yield k, 0
+        else:
+            keys.append(k)
+    if not keys:
+        return
+
+    F = VectorField(E.q)
+    batch = PointBatch.from_points([Qs[k] for k in keys], F).normalise()
+    step = PointBatch.from_points([C], F)
+    keys = np.array(keys)
+    fingerprints = np.frombuffer(table.fingerprints, dtype=np.uint64)
+
+    for j in range(m + 1):
+        found = np.zeros(len(keys), dtype=bool)
+        if len(fingerprints):
+            fps = F.low64(F.to_plain(batch.x))
+            index = np.minimum(np.searchsorted(fingerprints, fps), len(fingerprints) - 1)
+            for c in np.flatnonzero(fingerprints[index] == fps):
+                (Qi,) = batch[c:c + 1].to_points(E)
+                d = giant_step_match(table, Qi, j)
+                if d is not None:
+                    found[c] = True
+                    yield int(keys[c]), d
+        if found.any():
+            batch, keys = batch[~found], keys[~found]
+            if not len(keys):
+                return
+
+        previous, batch = batch, batch.madd(step)
+        found = np.zeros(len(keys), dtype=bool)
+        for c in np.flatnonzero(F.is_zero(batch.z)):
+            # Qi == +-C, redo the step with __add__
+            (Qi,) = previous[c:c + 1].to_points(E)
+            Qi = Qi + C
+            if Qi.is_inf():
+                # As giant_step_match would on the next step
+                found[c] = True
+                yield int(keys[c]), (j + 1) * m if j < m else None
+            else:
+                fixed = PointBatch.from_points([Qi], F)
+                batch.x[:, c], batch.y[:, c], batch.z[:, c] = fixed.x[:, 0], fixed.y[:, 0], fixed.z[:, 0]
+        if found.any():
+            batch, keys = batch[~found], keys[~found]
+            if not len(keys):
+                return
+        batch.normalise()
+
+    # No solution
+    for k in keys:
+        yield int(k), None
+
+
+def rho_partition(P, Q, order, rng=random):
+    """
+    Random r-adding walk, step s adds
+    M[s] = m[s]*P + n[s]*Q
+    """
+    m = [rng.randint(0, order-1) for i in range(PARTITION)]
+    n = [rng.randint(0, order-1) for i in range(PARTITION)]
+    E = P.curve
+    M = [E.multi_scalar_mul((P, Q), (m[i], n[i])) for i in range(PARTITION)]
+    return m, n, M
+
+
+def discrete_log_rho(P, Q, n, upper_bound=None, checkpoint=None):
+    """
+    Pollard rho with a few remembered points. With a
+    Checkpoint the walk, its position and memory are
+    saved, and a resumed solve carries on the walk.
+    """
+    order = upper_bound or n
+    m = ceil(sqrt(order))
+
+    # Jump setup costs more than bsgs for small intervals
     if m < PARTITION:
         return bsgs(P, Q, n, upper_bound=upper_bound)
 
+    # The walk setup and every restart
+    # take multiples of P and Q
+    P.precompute(order.bit_length())
+    Q.precompute(order.bit_length())
+
     # margin for error
     reset_bound = 8 * m
 
+    state = None
+    if checkpoint is not None:
+        key = checkpoint.key("rho", P, Q, order)
+        state = checkpoint.get(key)
+
     # to avoid infinite loops
-    for s in range(10):
-        # random walk function setup
-        m = [random.randint(0, upper_bound-1) for i in range(PARTITION)]
-        n = [random.randint(0, upper_bound-1) for i in range(PARTITION)]
-        M = [m[i] * P + n[i] * Q for i in range(PARTITION)]
+    for attempt in range(state["attempt"] if state else 0, 10):
+        if state:
+            # Resume the saved walk
+            m, n = state["walk"]
+            E = P.curve
+            M = [E.multi_scalar_mul((P, Q), (m[i], n[i])) for i in range(PARTITION)]
+            ax, bx = state["ab"]
+            x = point_from_tuple(E, state["x"])
+            sigma, H = [], {}
+            for i, y, ab in state["sigma"]:
+                if y is None:
+                    sigma.append((0, None))
+                    continue
+                y = point_from_tuple(E, y)
+                sigma.append((i, y))
+                H[y] = ab
+            i0, nextsigma, start = state["i0"], state["next"], state["i"]
+            state = None
+        else:
+            # random walk function setup
+            m, n, M = rho_partition(P, Q, order)
 
-        ax = random.randint(0, upper_bound-1)
-        bx = 0
-        x = ax * P
+            ax = random.randint(0, order-1)
+            bx = 0
+            # Stepped in place, H and sigma keep copies
+            x = (ax * P).copy()
 
-        sigma = [(0, None)]*MEMORY
-        H = {}  # memory
-        i0 = 0
-        nextsigma = 0
+            sigma = [(0, None)]*MEMORY
+            H = {}  # memory
+            i0 = 0
+            nextsigma = 0
+            start = 0
 
         # random walk, we need an efficient hash
-        for i in range(reset_bound):
+        for i in range(start, reset_bound):
             s = hash(x) % PARTITION
-            (x, ax, bx) = (x + M[s], ax + m[s], bx + n[s])
+            x.iadd_affine(M[s])
+            (ax, bx) = (ax + m[s], bx + n[s])
             # look for collisions
             if x in H:
                 ay, by = H[x]
                 if bx == by:
                     break
                 else:
-                    res = (ay - ax) * pow(bx - by, -1, upper_bound)
+                    res = (ay - ax) * pow(bx - by, -1, order) % order
                     if res * P == Q:
+                        if checkpoint is not None:
+                            checkpoint.pop(key)
                         return res
                     else:
                         break
@@ -125,17 +381,115 @@ def discrete_log_rho(P, Q, n, upper_bound=None):
             elif i >= nextsigma:
                 if sigma[i0][1] is not None:
                     H.pop(sigma[i0][1])
-                sigma[i0] = (i, x)
+                y = x.copy()
+                sigma[i0] = (i, y)
                 i0 = (i0 + 1) % MEMORY
                 nextsigma = 3 * sigma[i0][0]  # 3 seems a good choice
-                H[x] = (ax, bx)
+                H[y] = (ax, bx)
+
+            if checkpoint is not None and i & 4095 == 0 and checkpoint.due():
+                checkpoint.set(key, {
+                    "attempt": attempt, "walk": (m, n), "i": i + 1, "ab": (ax, bx), "x": x.to_tuple(),
+                    "sigma": [(j, y.to_tuple(), H[y]) if y is not None else (0, None, None) for j, y in sigma],
+                    "i0": i0, "next": nextsigma,
+                })
+                checkpoint.save()
+
+    if checkpoint is not None:
+        checkpoint.pop(key)
+    raise ValueError(f"Pollard rho failed after 10 random walks for {upper_bound=}")
+
 
-    exit("Algorithm failed...")
+def kangaroo_jumps(P, mean):
+    """
+    Jump distances 2^i for i < k, with k picked so the
+    mean (2^k - 1)/k is close to `mean`, and the jump
+    points 2^i * P normalised
+    """
+    k = 1
+    while ((1 << (k + 1)) - 1) / (k + 1) <= mean:
+        k += 1
+    S = [1 << i for i in range(k)]
+    J = [P.copy()]
+    for _ in range(k - 1):
+        J.append(J[-1] + J[-1])
+    normalise_all([Ji for Ji in J if not Ji.is_inf() and Ji.z != P.curve.one])
+    return S, J
+
+
+def kangaroo_log(P, Q, d, lower, upper, n):
+    """
+    A log d of Q from a kangaroo collision moved into
+    [lower, upper), or None. Kangaroos run past the
+    interval and round the group when P has order at
+    most the width, so d is only known modulo the order
+    of P, which divides n and, in Pohlig-Hellman, the
+    width of the interval.
+    """
+    for m in (n, upper - lower):
+        x = lower + (d - lower) % m
+        if x < upper and x * P == Q:
+            return x
+    return None
+
+
+def discrete_log_kangaroo(P, Q, n, upper_bound=None, lower_bound=0, tries=4):
+    """
+    Pollard's kangaroo method for d in [lower_bound,
+    upper_bound), about 2.5*sqrt(width) steps and
+    constant memory. A tame kangaroo jumps from the top
+    of the interval and sets a trap where it stops, a
+    wild kangaroo from Q jumps until it lands in the trap
+    or passes it. Returns None if d is not found.
+    """
+    upper = upper_bound or n
+    width = upper - lower_bound
+    if width <= 0:
+        raise ValueError(f"Empty interval [{lower_bound}, {upper})")
+    root = isqrt(width)
+
+    # Jump setup costs more than bsgs for small intervals
+    if root < PARTITION:
+        d = bsgs(P, Q - lower_bound * P, n, upper_bound=width)
+        return None if d is None else d + lower_bound
+
+    S, J = kangaroo_jumps(P, root // 2)
+    k = len(S)
+    for _ in range(tries):
+        # Each try needs a different walk
+        salt = random.getrandbits(64)
+
+        # Tame kangaroo from the top of the interval,
+        # steps stay affine so x picks the jump
+        T = (upper * P).copy().normalise_coordinates()
+        dT = 0
+        for _ in range(2 * root):
+            s = hash(T.x ^ salt) % k
+            dT += S[s]
+            batch_iadd_affine([T], [J[s]])
+
+        # Wild kangaroo from Q, which has passed the
+        # trap once its distance exceeds the tame's
+        W = Q.copy().normalise_coordinates()
+        dW = 0
+        while dW <= width + dT:
+            if W.x == T.x and W.y == T.y:
+                d = kangaroo_log(P, Q, upper + dT - dW, lower_bound, upper, n)
+                if d is not None:
+                    return d
+                break
+            s = hash(W.x ^ salt) % k
+            dW += S[s]
+            batch_iadd_affine([W], [J[s]])
+    return None
 
 
 def crt(xs, ns_fac, n):
     x = 0
     ns = [p ** e for p, e in ns_fac]
+    if len(ns) == 1:
+        # The common factor of one modulus is all of it
+        return xs[0] % ns[0]
     common = reduce(gcd, ns)
     ns = [n // common for n in ns]
 
@@ -146,9 +500,18 @@ def crt(xs, ns_fac, n):
     return x % n
 
 
-def pohlig_hellman(P, Q, n, n_factors, dlog=bsgs):
-    dlogs = []
-    for pi, ei in n_factors:
+def _pohlig_hellman_step(P, Q, n, pi, ei, dlog=bsgs, checkpoint=None):
+    """
+    Solve the discrete log of Q modulo pi^ei,
+    independent of every other prime power.
+
+    With a Checkpoint, xi is saved after every exponent
+    and the checkpoint is passed on to dlog if it takes one.
+    """
+    E = P.curve
+    # Counts of this prime go to their own section
+    section = E.counters.section(f"{pi}^{ei}") if E.counters is not None else nullcontext()
+    with section:
         # Set up for each step
         ni = pi ** ei
         tmp = n // ni
@@ -156,20 +519,26 @@ def pohlig_hellman(P, Q, n, n_factors, dlog=bsgs):
         Qi = tmp * Q
 
         # Groups of prime-power order
-        xi = 0
-        Qk_mul = ni // pi
-        gamma = Qk_mul * Pi
+        xi, k0 = 0, 0
+        options = {}
+        if checkpoint is not None:
+            key = checkpoint.key("pohlig_hellman", P, Q, n, pi, ei)
+            k0, xi = checkpoint.get(key, (0, 0))
+            if "checkpoint" in signature(dlog).parameters:
+                options["checkpoint"] = checkpoint
+        gamma = (ni // pi) * Pi
+        Qk_mul = ni // pi ** (k0 + 1)
 
-        for k in range(ei):
-            # Create hk in <γ>
-            Pk = -xi * Pi
-            Qk = Qk_mul * (Pk + Qi)
+        for k in range(k0, ei):
+            # Create hk = Qk_mul * (Qi - xi*Pi) in <γ>,
+            # Pi has order dividing ni
+            Qk = E.multi_scalar_mul((Pi, Qi), (-xi * Qk_mul % ni, Qk_mul))
 
             # Solve partial dlog
-            dk = dlog(gamma, Qk, n, upper_bound=pi)
+            dk = dlog(gamma, Qk, n, upper_bound=pi, **options)
 
             if dk is None:
-                exit(f"Discrete log failed in bsgs step, for {str(gamma)}, {str(Qk)}, {pi=}")
+                raise ValueError(f"Discrete log failed for {str(gamma)}, {str(Qk)}, {pi=}")
 
             # increment the secret
             xi += dk*(pi**k)
@@ -177,7 +546,113 @@ def pohlig_hellman(P, Q, n, n_factors, dlog=bsgs):
             # Reduce the exponent
             Qk_mul = Qk_mul // pi
 
-        if hasattr(bsgs, 'baby_steps'):
-            del bsgs.baby_steps
-        dlogs.append(xi)
-    return crt(dlogs, n_factors, n)
+            if checkpoint is not None:
+                checkpoint.set(key, (k + 1, xi))
+                checkpoint.save()
+
+        return xi
+
+
+def pohlig_hellman(P, Q, n, n_factors, dlog=bsgs, processes=None, checkpoint=None):
+    """
+    Solve Q = d*P by solving for d modulo each
+    prime power of n and combining with crt.
+
+    With `processes` set, the prime powers are solved
+    in a process pool of that size, largest primes first.
+
+    With a Checkpoint, solved prime powers are saved and
+    skipped on a rerun, and removed once d is found.
+    Without `processes` the state of dlog is saved too,
+    see _pohlig_hellman_step.
+    """
+    if processes:
+        dlogs = _parallel_pohlig_hellman(P, Q, n, n_factors, dlog, processes, checkpoint)
+    else:
+        # Every prime takes a cofactor multiple of P and Q
+        P.precompute(n.bit_length())
+        Q.precompute(n.bit_length())
+
+        dlogs = []
+        for pi, ei in n_factors:
+            dlogs.append(_pohlig_hellman_step(P, Q, n, pi, ei, dlog=dlog, checkpoint=checkpoint))
+    d = crt(dlogs, n_factors, n)
+
+    if checkpoint is not None:
+        checkpoint.pop(*(checkpoint.key("pohlig_hellman", P, Q, n, pi, ei) for pi, ei in n_factors))
+    return d
+
+
+def _pohlig_hellman_task(args):
+    i, *args = args
+    return i, _pohlig_hellman_step(*args)
+
+
+def _parallel_pohlig_hellman(P, Q, n, n_factors, dlog, processes, checkpoint=None):
+    dlogs = [None] * len(n_factors)
+    keys = [None] * len(n_factors)
+    if checkpoint is not None:
+        for i, (pi, ei) in enumerate(n_factors):
+            keys[i] = checkpoint.key("pohlig_hellman", P, Q, n, pi, ei)
+            k, xi = checkpoint.get(keys[i], (0, 0))
+            if k == ei:
+                dlogs[i] = xi
+
+    # Schedule the largest primes first so the slowest
+    # subproblem is never left waiting at the end
+    order = sorted((i for i in range(len(n_factors)) if dlogs[i] is None), key=lambda i: n_factors[i][0], reverse=True)
+    tasks = [(i, P, Q, n, *n_factors[i], dlog) for i in order]
+    with Pool(processes) as pool:
+        for i, xi in pool.imap_unordered(_pohlig_hellman_task, tasks):
+            dlogs[i] = xi
+            if checkpoint is not None:
+                checkpoint.set(keys[i], (n_factors[i][1], xi))
+                checkpoint.save()
+    return dlogs
+
+
+def pohlig_hellman_batch(P, Qs, n, n_factors):
+    """
+    Solve Q = d*P for every Q in Qs, sharing the
+    cofactor multiples of P and the baby steps
+    between all targets.
+
+    Yields (Q, d) as each target is solved, the
+    largest prime is left until last so results
+    stream out during its giant steps.
+    """
+    E = P.curve
+    Qs = list(Qs)
+    P.precompute(n.bit_length())
+    dlogs = [[0] * len(n_factors) for _ in Qs]
+    order = sorted(range(len(n_factors)), key=lambda i: n_factors[i][0])
+
+    for step, f in enumerate(order):
+        pi, ei = n_factors[f]
+        ni = pi ** ei
+        tmp = n // ni
+        Pi = tmp * P
+        Qis = [tmp * Q for Q in Qs]
+        # Pi is used for every target and exponent
+        Pi.precompute(ni.bit_length())
+
+        xis = [0] * len(Qs)
+        Qk_mul = ni // pi
+        gamma = Qk_mul * Pi
+
+        for k in range(ei):
+            Qks = [E.multi_scalar_mul((Pi, Qi), (-xi * Qk_mul % ni, Qk_mul)) for xi, Qi in zip(xis, Qis)]
+            last = step == len(order) - 1 and k == ei - 1
+
+            for t, dk in bsgs_batch(gamma, Qks, n, upper_bound=pi):
+                if dk is None:
+                    raise ValueError(f"Discrete log failed in bsgs step, for {str(gamma)}, {str(Qks[t])}, {pi=}")
+                xis[t] += dk*(pi**k)
+                if last:
+                    dlogs[t][f] = xis[t]
+                    yield Qs[t], crt(dlogs[t], n_factors, n)
+
+            Qk_mul = Qk_mul // pi
+
+        for t, xi in enumerate(xis):
+            dlogs[t][f] = xi
@@ -0,0 +1,76 @@
+from math import ceil
+from gmpy2 import mpz
+
+
+class PrimeField:
+    """
+    Residues modulo q held as mpz
+    and reduced with %
+    """
+    name = "mpz"
+
+    def __init__(self, q):
+        self.q = mpz(q)
+        self.one = mpz(1)
+
+    def to_field(self, x):
+        return mpz(x) % self.q
+
+    def from_field(self, x):
+        return x
+
+    def mul(self, x, y):
+        return x * y % self.q
+
+    def inverse(self, x):
+        return pow(x, -1, self.q)
+
+
+class MontgomeryField:
+    """
+    Residues modulo q held in Montgomery form x*R
+    with R = 2^k > q. Products are reduced with REDC,
+    which replaces the division by q with shifts and
+    masks by R.
+    """
+    name = "montgomery"
+
+    def __init__(self, q):
+        self.q = mpz(q)
+        # R is a whole number of 64-bit words
+        self.k = 64 * ceil(self.q.bit_length() / 64)
+        self.R = mpz(1) << self.k
+        self.mask = self.R - 1
+        # q * q_prime == -1 mod R
+        self.q_prime = -pow(self.q, -1, self.R) % self.R
+        self.one = self.R % self.q
+        self.R2 = self.R ** 2 % self.q
+        self.R3 = self.R ** 3 % self.q
+
+    def redc(self, T):
+        """
+        T * R^-1 mod q for 0 <= T < q*R
+        """
+        m = ((T & self.mask) * self.q_prime) & self.mask
+        t = (T + m * self.q) >> self.k
+        return t - self.q if t >= self.q else t
+
+    def to_field(self, x):
+        return self.redc((mpz(x) % self.q) * self.R2)
+
+    def from_field(self, x):
+        return self.redc(x)
+
+    def mul(self, x, y):
+        return self.redc(x * y)
+
+    def inverse(self, x):
+        # (x*R)^-1 * R^3 * R^-1 = x^-1 * R
+        return self.redc(pow(x, -1, self.q) * self.R3)
+
+
+FIELDS = {
+    PrimeField.name: PrimeField,
+    MontgomeryField.name: MontgomeryField,
+}
+
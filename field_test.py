@@ -0,0 +1,49 @@
+import time
+from random import randint, seed
+from curve import EllipticCurve
+from field import FIELDS
+from discrete_log import pohlig_hellman, baby_step_cache
+from projective_ecdlp_test import medium, hard
+
+
+def benchmark_mul(field, data=hard, samples=1000):
+    # average time of a field multiplication
+    seed(0)
+    F = FIELDS[field](data['p'])
+    xs = [F.to_field(randint(0, data['p'] - 1)) for _ in range(samples)]
+    s = time.time()
+    for x, y in zip(xs, reversed(xs)):
+        F.mul(x, y)
+    return (time.time() - s) / samples
+
+
+def benchmark_scalar_mul(field, data=hard, samples=100):
+    # average time of d*P on the challenge curve
+    E = EllipticCurve(data['p'], data['a'], data['b'], field=field)
+    P = E(data['Px'], data['Py'])
+    s = time.time()
+    for _ in range(samples):
+        data['d'] * P
+    return (time.time() - s) / samples
+
+
+def benchmark_dlog(field, data=medium):
+    E = EllipticCurve(data['p'], data['a'], data['b'], field=field)
+    P = E(data['Px'], data['Py'])
+    Q = E(data['Qx'], data['Qy'])
+    baby_step_cache.clear()
+    s = time.time()
+    assert pohlig_hellman(P, Q, data['n'], data['n_factors']) == data['d']
+    return time.time() - s
+
+
+def main():
+    for field in FIELDS:
+        print(f'{field}:')
+        print(f'  field mul   -> {benchmark_mul(field) * 10**9:.0f}ns')
+        print(f'  scalar mul  -> {benchmark_scalar_mul(field) * 10**3:.3f}ms')
+        print(f'  medium dlog -> {benchmark_dlog(field):.3f}s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+import time
+from random import randint, seed
+from curve import EllipticCurve
+from point import EllipticCurvePoint as Point
+from projective_ecdlp_test import hard
+
+# y^2 = x^3 + 7 over the secp256k1 prime, a = 0
+secp256k1 = {
+    "p": 2**256 - 2**32 - 977,
+    "a": 0,
+    "b": 7,
+    "Px": 55066263022277343669578718895168534326250603453777594175500187360389116729240,
+    "Py": 32670510020758816978083085130507043184471273380659243275938904335757337482424,
+}
+
+
+def generate_points(E, P, n):
+    # consecutive multiples of a random multiple
+    # of P, each with a random projective scaling
+    seed(0)
+    pts = []
+    R = randint(1, E.q) * P
+    for _ in range(n):
+        R = (R + P).normalise_coordinates()
+        z = randint(1, E.q - 1)
+        pts.append(Point(E, R.x * z % E.q, R.y * z % E.q, z, check=False))
+    return pts
+
+
+def benchmark(double, pts):
+    # average time of one doubling
+    s = time.time()
+    for P in pts:
+        double(P)
+    return (time.time() - s) / len(pts)
+
+
+def main(samples=10 ** 5):
+    for name, data in [("hard (a = -3)", hard), ("secp256k1 (a = 0)", secp256k1)]:
+        E = EllipticCurve(data['p'], data['a'], data['b'])
+        pts = generate_points(E, E(data['Px'], data['Py']), samples)
+        # The specialised formula must agree with the generic one
+        assert all(E._double(P) == EllipticCurve._double(E, P) for P in pts[:100])
+        generic = benchmark(lambda P: EllipticCurve._double(E, P), pts)
+        special = benchmark(E._double, pts)
+        print(f'{name}:')
+        print(f'  dbl-2007-bl -> {generic * 10**9:.0f}ns')
+        print(f'  {E.doubling} -> {special * 10**9:.0f}ns ({generic / special:.2f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+from collections import Counter
+from contextlib import contextmanager
+
+# Curve methods counted by instrument()
+OPERATIONS = ("_add", "_madd", "_imadd", "_mmadd", "_double", "_mdouble")
+
+# Field multiplications and squarings of every
+# formula, counted from the implementations in
+# curve.py. _imadd which gives up on P == +-Q
+# is counted in full.
+FORMULA_MULS = {
+    "_add": 14, "_madd": 11, "_imadd": 11, "_mmadd": 7,
+    "_double": 12, "_mdouble": 8, "_double_a3": 10, "_double_a0": 10, "_mdouble_a0": 8,
+    "_jacobian_add": 16, "_jacobian_madd": 11, "_jacobian_imadd": 11, "_jacobian_mmadd": 6,
+    "_jacobian_double": 10, "_jacobian_double_a3": 8, "_jacobian_double_a0": 7, "_jacobian_mdouble": 6,
+    "_field_add": 14, "_field_madd": 11, "_field_imadd": 11, "_field_mmadd": 7,
+    "_field_double": 12, "_field_mdouble": 8,
+}
+
+# Multiplications per point of a batch normalisation
+# and of a batch affine addition, Jacobian points and
+# Montgomery residues take a few more
+NORMALISE_MULS = 7
+AFFINE_ADD_MULS = 6
+
+
+class Counters:
+    """
+    Operation counts, split into named sections such as
+    the primes of a Pohlig-Hellman solve. Counts made
+    outside any section go to "other".
+    """
+
+    def __init__(self):
+        self.sections = {}
+        self.current = self.sections.setdefault("other", Counter())
+
+    def count(self, name, n=1, muls=0):
+        c = self.current
+        c[name] += n
+        if muls:
+            c["multiplications"] += n * muls
+
+    @contextmanager
+    def section(self, name):
+        previous = self.current
+        self.current = self.sections.setdefault(name, Counter())
+        try:
+            yield self
+        finally:
+            self.current = previous
+
+    def report(self):
+        """
+        {section: {counter: count}} for every section
+        with counts, and their sum as "total"
+        """
+        report = {name: dict(c) for name, c in self.sections.items() if c}
+        total = Counter()
+        for c in self.sections.values():
+            total.update(c)
+        report["total"] = dict(total)
+        return report
+
+    def __str__(self):
+        report = self.report()
+        columns = sorted({k for counts in report.values() for k in counts})
+        width = max(len(name) for name in report)
+        lines = [" ".join([f"{'section':>{width}}"] + [f"{c:>15}" for c in columns])]
+        for name, counts in report.items():
+            lines.append(" ".join([f"{name:>{width}}"] + [f"{counts.get(c, 0):>15}" for c in columns]))
+        return "\n".join(lines)
+
+
+def _counted(counters, name, method):
+    muls = FORMULA_MULS.get(method.__func__.__name__, 0)
+
+    def counted(*args):
+        counters.count(name, 1, muls)
+        return method(*args)
+    return counted
+
+
+def instrument(E, counters=None):
+    """
+    Count the operations of the curve E into counters,
+    a new Counters by default. The formulas are wrapped
+    on E alone, uninstrument(E) puts them back so the
+    counts cost nothing when disabled.
+    """
+    if E.counters is not None:
+        uninstrument(E)
+    counters = Counters() if counters is None else counters
+    E._uncounted = {name: E.__dict__.get(name) for name in OPERATIONS}
+    for name in OPERATIONS:
+        setattr(E, name, _counted(counters, name, getattr(E, name)))
+    E.counters = counters
+    return counters
+
+
+def uninstrument(E):
+    if E.counters is None:
+        return
+    for name, method in E._uncounted.items():
+        if method is None:
+            # The class method again
+            delattr(E, name)
+        else:
+            setattr(E, name, method)
+    del E._uncounted
+    E.counters = None
+
+
+@contextmanager
+def counting(*curves, counters=None):
+    """
+    with counting(E) as counters:
+        pohlig_hellman(P, Q, n, n_factors)
+    print(counters)
+    """
+    counters = Counters() if counters is None else counters
+    for E in curves:
+        instrument(E, counters)
+    try:
+        yield counters
+    finally:
+        for E in curves:
+            uninstrument(E)
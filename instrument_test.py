@@ -0,0 +1,23 @@
+from curve import COORDINATES
+from field import FIELDS, PrimeField
+from instrument import FORMULA_MULS, counting
+from projective_ecdlp_test import easy, medium, hard, challenge
+
+
+def test_formula_muls():
+    # One addition and one doubling count the
+    # multiplications of the formulas in use
+    for data in (easy, medium, hard):
+        for coordinates in COORDINATES:
+            for field in FIELDS:
+                if coordinates == "jacobian" and field != PrimeField.name:
+                    continue
+                E, P, Q = challenge(data, coordinates=coordinates, field=field)
+                P, Q = P + P, Q + Q
+                add, double = E._add.__func__.__name__, E._double.__func__.__name__
+                with counting(E) as counters:
+                    E._add(P, Q)
+                    E._double(P)
+                total = counters.report()["total"]
+                assert total["_add"] == 1 and total["_double"] == 1
+                assert total["multiplications"] == FORMULA_MULS[add] + FORMULA_MULS[double]
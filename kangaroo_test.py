@@ -0,0 +1,34 @@
+import random
+from discrete_log import discrete_log_kangaroo, pohlig_hellman
+from parallel import parallel_kangaroo
+from projective_ecdlp_test import easy, challenge, subgroup
+
+SOLVERS = (discrete_log_kangaroo, parallel_kangaroo)
+
+
+def test_whole_subgroup(data=easy, pi=157025399, samples=3):
+    # The interval is the whole group of order pi,
+    # so the kangaroos run round it
+    random.seed(0)
+    G = subgroup(data, pi)
+    for dlog in SOLVERS:
+        for _ in range(samples):
+            d = random.randrange(pi)
+            assert dlog(G, d * G, data['n'], upper_bound=pi) == d
+
+
+def test_subinterval(data=easy, pi=729196241, width=2 ** 24, samples=3):
+    random.seed(1)
+    G = subgroup(data, pi)
+    for dlog in SOLVERS:
+        for _ in range(samples):
+            lower = random.randrange(pi - width)
+            for d in (lower, lower + width - 1, lower + random.randrange(width)):
+                assert dlog(G, d * G, data['n'], upper_bound=lower + width, lower_bound=lower) == d
+
+
+def test_pohlig_hellman(data=easy):
+    _, P, Q = challenge(data)
+    for dlog in SOLVERS:
+        assert pohlig_hellman(P, Q, data['n'], data['n_factors'], dlog=dlog) == data['d']
+
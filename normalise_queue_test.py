@@ -1,8 +1,8 @@
 import time
-from point import EllipticCurvePoint as Point
-from random import randint
+from point import EllipticCurvePoint as Point, normalise_all
+from random import randint, seed
 from curve import EllipticCurve
-from discrete_log import normalise_queue
+from discrete_log import bsgs, baby_step_cache
 from projective_ecdlp_test import easy, medium, hard
 
 def generate_queue(n, data=hard):
@@ -24,18 +24,41 @@ def test(n, data=hard):
     s = time.time()
     queue = []
     for i in range(SAMPLES):
-        queue.append(test_data[i])
+        queue.append(test_data[i][1])
         if len(queue) == n or i == SAMPLES - 1:
-            queue = normalise_queue(queue)
+            normalise_all(queue)
             queue = []
     t = time.time() - s
     return t
 
+def benchmark_block(block, data=medium, samples=5):
+    # average time of bsgs on the largest prime of data
+    # with giant steps normalised in blocks of `block`
+    E = EllipticCurve(data['p'], data['a'], data['b'])
+    P = E(data['Px'], data['Py'])
+    pi = data['n_factors'][-1][0]
+    P = (data['n'] // pi) * P
+    # Build the baby steps outside the timing
+    baby_step_cache.clear()
+    bsgs(P, P, data['n'], upper_bound=pi)
+    # Same targets for every block size
+    seed(0)
+    ds = [randint(0, pi - 1) for _ in range(samples)]
+    Qs = [d * P for d in ds]
+    s = time.time()
+    for d, Q in zip(ds, Qs):
+        assert bsgs(P, Q, data['n'], upper_bound=pi, block=block) == d
+    return (time.time() - s) / samples
+
 def main():
     cand = [1, 10, 50, 100, 300, 500, 750, 1000, 3000, 5000, 7500, 10000, 20000, 50000, 100000, 200000, 500000, 10000000]
     for n in cand:
         print(f'{n}-batches -> ', end='', flush=True)
-        print(f'{test(n):.3f}ms')
+        print(f'{test(n):.3f}s')
+    # Giant step block size, see GIANT_STEP_BLOCK
+    for block in [1, 8, 32, 64, 128, 256, 512, 1024, 4096]:
+        print(f'{block}-blocks -> ', end='', flush=True)
+        print(f'{benchmark_block(block):.3f}s')
 
 if __name__ == '__main__':
     main()
\ No newline at end of file
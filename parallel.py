@@ -0,0 +1,451 @@
+from collections import deque
+from math import ceil, sqrt, isqrt
+from multiprocessing import Pool, Event, TimeoutError, cpu_count
+from multiprocessing.managers import BaseManager
+import random
+from discrete_log import bsgs, baby_step_cache, build_baby_steps, giant_steps, giant_step_block, rho_partition, kangaroo_jumps, kangaroo_log, PARTITION
+from point import batch_iadd_affine
+from tables import BabyStepTable
+
+# Below this many baby steps starting the
+# pools costs more than the search itself
+PARALLEL_THRESHOLD = 2 ** 12
+
+# How often rho workers check if another
+# worker has already found the solution,
+# giant step workers check every block
+CHECK_EVERY = 1024
+
+# Pollard rho walks stepped together by each
+# process, sharing one inversion per step
+RHO_WALKS = 64
+
+# Steps remembered by each negation map walk
+# to find fruitless cycles
+RHO_CYCLE_WINDOW = 16
+
+# Rho walks give up after this many times sqrt(order)
+# steps, when Q is likely not a multiple of P
+RHO_BUDGET = 16
+
+# Kangaroo walks give up after this many times
+# sqrt(width) steps, when d is likely not in
+# the interval
+KANGAROO_BUDGET = 16
+
+# Worker globals, set by the pool initialiser
+_table = None
+_found = None
+
+
+def _init_worker(table, found):
+    global _table, _found
+    _table, _found = table, found
+
+
+def _split(start, stop, parts):
+    """
+    Split range(start, stop) into at most
+    `parts` contiguous (lo, hi) chunks
+    """
+    step = max(1, ceil((stop - start) / parts))
+    return [(lo, min(lo + step, stop)) for lo in range(start, stop, step)]
+
+
+def _baby_step_shard(P, m, lo, hi):
+    """
+    Fingerprint table of the baby steps for lo <= i < hi
+    """
+    return build_baby_steps(P, m, lo, hi)
+
+
+def _giant_step_range(P, Q, n, m, lo, hi):
+    """
+    Scan the giant steps Q - j*m*P for lo <= j < hi
+    against the baby steps inherited by the worker
+    """
+    C = (m * (n - 1)) * P
+    Qlo = Q + lo * C
+    for j, points in giant_steps(Qlo, C, hi - lo):
+        if _found.is_set():
+            return None
+        for _, d in giant_step_block(_table, points, range(lo + j, lo + j + len(points))):
+            _found.set()
+            return d
+    return None
+
+
+def parallel_bsgs(P, Q, n, upper_bound=None, processes=None):
+    """
+    Baby step giant step over a process pool.
+
+    Each worker builds a shard of the baby steps, the
+    shards are merged and every worker then scans a
+    disjoint range of giant steps. Workers stop early
+    as soon as any one of them finds the solution.
+
+    Giant steps are not met in order, so the result is
+    reduced modulo `upper_bound`, taken as the order of P
+    """
+    if upper_bound:
+        m = ceil(sqrt(upper_bound))
+    else:
+        m = ceil(sqrt(n))
+
+    if m < PARALLEL_THRESHOLD:
+        return bsgs(P, Q, n, upper_bound=upper_bound)
+
+    processes = processes or cpu_count()
+    found = Event()
+
+    # Baby steps, one shard per worker
+    table = baby_step_cache.get(P, m)
+    if table is None:
+        tasks = [(P, m, lo, hi) for lo, hi in _split(1, m // 2 + 1, processes)]
+        with Pool(processes, initializer=_init_worker, initargs=(None, found)) as pool:
+            table = BabyStepTable.merge(P, m, pool.starmap(_baby_step_shard, tasks))
+        baby_step_cache.put(table)
+
+    # Giant steps, the table is handed to the workers
+    # once when the pool starts rather than per task.
+    # Use more chunks than workers so finished workers
+    # pick up remaining ranges.
+    tasks = [(P, Q, n, m, lo, hi) for lo, hi in _split(0, m + 1, 4 * processes)]
+    with Pool(processes, initializer=_init_worker, initargs=(table, found)) as pool:
+        # The other workers stop on found within
+        # a block, see parallel_rho
+        results = [d for d in pool.imap_unordered(_giant_step_worker, tasks) if d is not None]
+    if results:
+        return results[0] % (upper_bound or n)
+    # No solution
+    return None
+
+
+def _giant_step_worker(args):
+    return _giant_step_range(*args)
+
+
+class CollisionStore:
+    """
+    Central table of distinguished points
+    reported by Pollard rho walks
+    """
+
+    def __init__(self, points=None):
+        self.points = dict(points or {})
+
+    def add(self, key, a, b):
+        """
+        Record key = a*P + b*Q, returning the earlier
+        (a, b) if the key has been seen before
+        """
+        if key in self.points:
+            return self.points[key]
+        self.points[key] = (a, b)
+        return None
+
+    def __len__(self):
+        return len(self.points)
+
+    def dump(self):
+        return dict(self.points)
+
+
+class CollisionServer(BaseManager):
+    """
+    Local stand-in server sharing one CollisionStore
+    between processes
+
+    with CollisionServer() as server:
+        store = server.CollisionStore()
+    """
+
+
+CollisionServer.register('CollisionStore', CollisionStore, exposed=('add', '__len__', 'dump'))
+
+
+def _rho_walks(P, Q, order, walk, dp_bits, seed, store, max_steps, found=None, walks=RHO_WALKS, negation=True, save=None):
+    """
+    van Oorschot-Wiener walks, each random start a*P + b*Q
+    follows the r-adding walk until it reaches a point
+    whose x-coordinate has `dp_bits` trailing zero bits.
+    Distinguished points go to the store until two walks
+    with different b collide.
+
+    `walks` walks advance together in affine coordinates
+    with one inversion per step for all of them.
+
+    With `negation` the walks run on classes {X, -X},
+    keeping the representative with the smaller y, which
+    shrinks the search space by half. The walk then falls
+    into fruitless cycles, which are found by repeated x
+    in the last RHO_CYCLE_WINDOW steps and left by doubling
+    the cycle's point with the smallest x.
+
+    `save` is called every CHECK_EVERY rounds. Returns
+    None after max_steps steps without d.
+    """
+    m, n, M = walk
+    rng = random.Random(seed)
+    dp_mask = (1 << dp_bits) - 1
+    # Walks which never reach a distinguished
+    # point are stuck in a cycle, abandon them
+    max_walk = 20 << dp_bits
+    # Every walk starts from a*P + b*Q, tables
+    # are not pickled so each worker builds its own
+    P.precompute(order.bit_length())
+    Q.precompute(order.bit_length())
+    E = P.curve
+    q = E.q
+    half = q // 2
+
+    def start():
+        a, b = rng.randrange(order), rng.randrange(order)
+        X = E.multi_scalar_mul((P, Q), (a, b)).copy()
+        return [X, a, b, 0, deque(maxlen=RHO_CYCLE_WINDOW), deque(maxlen=RHO_CYCLE_WINDOW)]
+
+    state = [start() for _ in range(walks)]
+    steps_taken = rounds = 0
+    while steps_taken < max_steps and (found is None or rounds % CHECK_EVERY or not found.is_set()):
+        rounds += 1
+        if save is not None and rounds % CHECK_EVERY == 0:
+            save()
+        heads, steps = [], []
+        for w, (X, a, b, length, xs, rest) in enumerate(state):
+            key = X.to_tuple()
+            if negation and key[1] > half:
+                # Negating the raw y suits every field backend
+                X.y = -X.y % q
+                key = (key[0], q - key[1])
+                a, b = -a % order, -b % order
+            x = key[0]
+            if x & dp_mask == 0:
+                if E.counters is not None:
+                    E.counters.count("store_probes")
+                hit = store.add(key, a, b)
+                if hit is not None:
+                    a2, b2 = hit
+                    if (b - b2) % order:
+                        d = (a2 - a) * pow(b - b2, -1, order) % order
+                        if d * P == Q:
+                            if found is not None:
+                                found.set()
+                            return d
+                state[w] = start()
+                continue
+            if length >= max_walk or X.is_inf():
+                state[w] = start()
+                continue
+            if negation:
+                if x in xs:
+                    # Fruitless cycle, every walk which meets it
+                    # leaves from the same point
+                    i = xs.index(x)
+                    cycle = list(zip(xs, rest))[i:]
+                    x, (y, a, b) = min(cycle, key=lambda entry: entry[0])
+                    to_field = E.field.to_field
+                    Z = E.point(E, to_field(x), to_field(y), E.one, check=False)
+                    Z = (Z + Z).normalise_coordinates()
+                    state[w] = [Z, 2 * a % order, 2 * b % order, length + 1, xs, rest]
+                    xs.clear()
+                    rest.clear()
+                    continue
+                xs.append(x)
+                rest.append((key[1], a, b))
+            s = hash(x) % PARTITION
+            heads.append(X)
+            steps.append(M[s])
+            state[w] = [X, (a + m[s]) % order, (b + n[s]) % order, length + 1, xs, rest]
+        steps_taken += len(heads)
+        if heads:
+            batch_iadd_affine(heads, steps)
+    return None
+
+
+def _rho_worker(args):
+    *args, negation = args
+    return _rho_walks(*args, found=_found, negation=negation)
+
+
+def parallel_rho(P, Q, n, upper_bound=None, processes=None, dp_bits=None, store=None, negation=True, checkpoint=None):
+    """
+    Pollard rho with distinguished points, by default
+    on classes {X, -X} with the negation map.
+
+    Without `processes` the walks run in this process
+    against an in-process CollisionStore. Otherwise every
+    worker runs its own walks and reports distinguished
+    points to a CollisionStore hosted by a CollisionServer.
+
+    With a Checkpoint the r-adding walk and distinguished
+    points are saved. A resumed solve starts fresh walks,
+    losing only the steps since their last distinguished
+    point.
+
+    Raises ValueError when the walks find no d within
+    RHO_BUDGET * sqrt(order) steps.
+    """
+    order = upper_bound or n
+    if ceil(sqrt(order)) < PARTITION:
+        return bsgs(P, Q, n, upper_bound=upper_bound)
+
+    if Q.is_inf():
+        return 0
+
+    state, points = None, None
+    if checkpoint is not None:
+        key = checkpoint.key("parallel_rho", P, Q, order, negation)
+        state = checkpoint.get(key)
+
+    if state:
+        # The saved points only match the saved walk
+        m, n_, dp_bits, points = state["walk"] + (state["dp_bits"], state["points"])
+        E = P.curve
+        walk = m, n_, [E.multi_scalar_mul((P, Q), (m[i], n_[i])) for i in range(PARTITION)]
+    else:
+        if dp_bits is None:
+            dp_bits = order.bit_length() // 4
+
+        # Every walk must follow the same r-adding walk
+        # so that walks which meet stay together
+        walk = rho_partition(P, Q, order)
+
+    max_steps = RHO_BUDGET * isqrt(order) // (processes or 1) + (RHO_WALKS << dp_bits)
+
+    def save(force=False):
+        if force or checkpoint.due():
+            checkpoint.set(key, {"walk": walk[:2], "dp_bits": dp_bits, "points": store.dump()})
+            checkpoint.save()
+
+    result = None
+    if not processes or processes == 1:
+        store = CollisionStore(points) if store is None else store
+        result = _rho_walks(P, Q, order, walk, dp_bits, random.getrandbits(64), store, max_steps, negation=negation,
+                            save=save if checkpoint is not None else None)
+    else:
+        found = Event()
+        with CollisionServer() as server:
+            store = server.CollisionStore(points) if store is None else store
+            tasks = [(P, Q, order, walk, dp_bits, random.getrandbits(64), store, max_steps, negation) for _ in range(processes)]
+            with Pool(processes, initializer=_init_worker, initargs=(None, found)) as pool:
+                results = pool.imap_unordered(_rho_worker, tasks)
+                while result is None:
+                    try:
+                        result = results.next(timeout=checkpoint.every if checkpoint is not None else None)
+                    except StopIteration:
+                        break
+                    except TimeoutError:
+                        save(force=True)
+                # The other workers stop once found is set.
+                # Terminating one as it sends its result
+                # can leave the pool's queue locked.
+                for _ in results:
+                    pass
+
+    if checkpoint is not None:
+        checkpoint.pop(key)
+    if result is None:
+        raise ValueError(f"Pollard rho failed after {max_steps} steps per process for {upper_bound=}")
+    return result
+
+
+def _kangaroo_walks(P, Q, lower, width, n, jumps, dp_bits, seed, store, max_steps, found=None, walks=RHO_WALKS):
+    """
+    van Oorschot-Wiener kangaroos, half of them tame from
+    random points in the interval and half wild from Q
+    plus a random offset. Kangaroos keep jumping past
+    distinguished points, which go to the store until a
+    tame and a wild kangaroo meet. A kangaroo which meets
+    the trail of its own kind starts again.
+    """
+    S, J = jumps
+    k = len(S)
+    rng = random.Random(seed)
+    dp_mask = (1 << dp_bits) - 1
+    P.precompute((lower + width).bit_length())
+    E = P.curve
+
+    def start(wild):
+        r = rng.randrange(width)
+        if wild:
+            # Position d + r, only the offset is known
+            X = E.multi_scalar_mul((P, Q), (r, 1))
+        else:
+            r += lower
+            X = r * P
+        return [X.copy(), wild, r]
+
+    state = [start(w % 2 == 1) for w in range(walks)]
+    steps = rounds = 0
+    while steps < max_steps and (found is None or rounds % CHECK_EVERY or not found.is_set()):
+        rounds += 1
+        heads, steps_ = [], []
+        for w, (X, wild, distance) in enumerate(state):
+            key = X.to_tuple()
+            if key[0] & dp_mask == 0:
+                if E.counters is not None:
+                    E.counters.count("store_probes")
+                hit = store.add(key, wild, distance)
+                if hit is not None:
+                    wild2, distance2 = hit
+                    if wild2 == wild:
+                        state[w] = start(wild)
+                        continue
+                    tame, wild_ = (distance2, distance) if wild else (distance, distance2)
+                    d = kangaroo_log(P, Q, tame - wild_, lower, lower + width, n)
+                    if d is not None:
+                        if found is not None:
+                            found.set()
+                        return d
+            s = hash(key[0]) % k
+            heads.append(X)
+            steps_.append(J[s])
+            state[w] = [X, wild, distance + S[s]]
+        steps += len(heads)
+        batch_iadd_affine(heads, steps_)
+    return None
+
+
+def _kangaroo_worker(args):
+    return _kangaroo_walks(*args, found=_found)
+
+
+def parallel_kangaroo(P, Q, n, upper_bound=None, lower_bound=0, processes=None, dp_bits=None, store=None):
+    """
+    Pollard kangaroo with distinguished points for d in
+    [lower_bound, upper_bound), with every process running
+    a herd of RHO_WALKS kangaroos. Memory grows with the
+    number of distinguished points, not the interval.
+    Returns None if d is not found.
+    """
+    upper = upper_bound or n
+    width = upper - lower_bound
+    if width <= 0:
+        raise ValueError(f"Empty interval [{lower_bound}, {upper})")
+    root = isqrt(width)
+    if root < PARTITION:
+        d = bsgs(P, Q - lower_bound * P, n, upper_bound=width)
+        return None if d is None else d + lower_bound
+
+    # The herd covers the interval together, the mean
+    # jump grows with the number of kangaroos
+    kangaroos = RHO_WALKS * (processes or 1)
+    jumps = kangaroo_jumps(P, max(1, kangaroos * root // 4))
+    if dp_bits is None:
+        dp_bits = max(0, (root // (8 * kangaroos)).bit_length() - 1)
+    max_steps = KANGAROO_BUDGET * root // (processes or 1) + (RHO_WALKS << dp_bits)
+
+    if not processes or processes == 1:
+        store = CollisionStore() if store is None else store
+        return _kangaroo_walks(P, Q, lower_bound, width, n, jumps, dp_bits, random.getrandbits(64), store, max_steps)
+
+    found = Event()
+    with CollisionServer() as server:
+        store = server.CollisionStore() if store is None else store
+        tasks = [(P, Q, lower_bound, width, n, jumps, dp_bits, random.getrandbits(64), store, max_steps) for _ in range(processes)]
+        with Pool(processes, initializer=_init_worker, initargs=(None, found)) as pool:
+            # Wait for the other workers to stop on found,
+            # see parallel_rho
+            results = [d for d in pool.imap_unordered(_kangaroo_worker, tasks) if d is not None]
+    # None if no solution
+    return results[0] if results else None
@@ -0,0 +1,344 @@
+from functools import partial
+from math import isqrt, prod
+from time import perf_counter
+import os
+import random
+from discrete_log import (bsgs, build_baby_steps, crt, discrete_log_trial, giant_steps, giant_step_block,
+                          kangaroo_jumps, rho_partition, _pohlig_hellman_step, PARTITION, GIANT_STEP_BLOCK)
+from parallel import parallel_rho, parallel_kangaroo, CollisionStore, _kangaroo_walks, _rho_walks, RHO_WALKS
+
+SOLVERS = ("trial", "bsgs", "rho", "kangaroo")
+
+# Peak bytes per baby step while a table is built,
+# the finished table keeps 16 of them
+BABY_STEP_BYTES = 72
+
+# Bytes per distinguished point in a CollisionStore
+DISTINGUISHED_POINT_BYTES = 260
+
+# Seconds to start a process pool and collision
+# server, paid by each parallel walk
+POOL_START = 0.2
+
+# Memory budget when the free memory of the
+# machine cannot be read
+DEFAULT_MEMORY = 2 ** 30
+
+# Size of the baby step table timed by calibrate
+CALIBRATE_M = 2048
+
+# Rounds of the rho and kangaroo herds timed by
+# calibrate, their walks start from scalars of
+# this many bits
+CALIBRATE_ROUNDS = 64
+CALIBRATE_START_BITS = 16
+
+# Runs of each operation timed by calibrate
+CALIBRATE_REPEATS = 3
+
+
+def _fastest(run, repeats=CALIBRATE_REPEATS):
+    times = []
+    for _ in range(repeats):
+        start = perf_counter()
+        run()
+        times.append(perf_counter() - start)
+    return min(times)
+
+
+def available_memory():
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return DEFAULT_MEMORY
+
+
+class CostModel:
+    """
+    Seconds per operation on one curve, from which
+    the planner estimates the time of every solver:
+
+    mul: a scalar multiplication by a scalar of `bits` bits
+    baby: a baby step, normalised and fingerprinted
+    giant: a giant step, stepped in a block and probed
+    walk: a step of a kangaroo herd
+    rho: a step of a rho herd with the negation map
+    pool: starting a process pool
+    """
+
+    def __init__(self, bits, mul, baby, giant, walk, rho, pool=POOL_START):
+        self.bits = bits
+        self.mul = mul
+        self.baby = baby
+        self.giant = giant
+        self.walk = walk
+        self.rho = rho
+        self.pool = pool
+
+    def __repr__(self):
+        return (f"CostModel(bits={self.bits}, mul={self.mul:.2e}, baby={self.baby:.2e}, giant={self.giant:.2e}, "
+                f"walk={self.walk:.2e}, rho={self.rho:.2e}, pool={self.pool:.2e})")
+
+    @classmethod
+    def calibrate(cls, P, n, rng=random):
+        """
+        Time each operation on the curve of P, taking the
+        fastest of a few runs as the machine may be busy
+        for one
+        """
+        # A copy, so a table attached to P is not used
+        R = P.copy()
+        scalars = [rng.randrange(n) for _ in range(8)]
+        X = scalars[-1] * R
+        mul = _fastest(lambda: [k * R for k in scalars]) / len(scalars)
+
+        baby = _fastest(lambda: build_baby_steps(R, CALIBRATE_M)) / (CALIBRATE_M // 2)
+
+        table = build_baby_steps(R, CALIBRATE_M)
+        steps = 4 * GIANT_STEP_BLOCK
+
+        def giant_run():
+            for j, points in giant_steps(X, CALIBRATE_M * R, steps):
+                for _ in giant_step_block(table, points, range(j, j + len(points))):
+                    pass
+        giant = _fastest(giant_run) / steps
+
+        # The herds of parallel_rho, whose walks canonicalise
+        # every point, look for fruitless cycles and leave
+        # them, and of parallel_kangaroo. No point is
+        # distinguished, so every step is timed, less the
+        # starts of the walks timed without steps.
+        steps = CALIBRATE_ROUNDS * RHO_WALKS
+        width = 1 << CALIBRATE_START_BITS
+        partition = rho_partition(R, X, n, rng)
+        jumps = kangaroo_jumps(R, width)
+
+        def rho_herd(steps):
+            return _fastest(lambda: _rho_walks(R, X, width, partition, n.bit_length(), rng.getrandbits(64),
+                                               CollisionStore(), steps))
+
+        def kangaroo_herd(steps):
+            return _fastest(lambda: _kangaroo_walks(R, X, 0, width, n, jumps, n.bit_length(), rng.getrandbits(64),
+                                                    CollisionStore(), steps))
+
+        rho = (rho_herd(steps) - rho_herd(0)) / steps
+        walk = (kangaroo_herd(steps) - kangaroo_herd(0)) / steps
+
+        return cls(n.bit_length(), mul, baby, giant, walk, rho)
+
+    def estimate(self, solver, width, exponent=1, cores=1):
+        """
+        Estimated (seconds, bytes) for `solver` to find
+        `exponent` logarithms below `width`
+        """
+        root = isqrt(width) + 1
+        # Setup scalars are reduced mod the width
+        mul = self.mul * width.bit_length() / self.bits
+        if solver == "trial":
+            return exponent * width / 2 * self.baby, 0
+        if solver == "bsgs":
+            m = root // 2
+            # The table is cached between exponents
+            return m * self.baby + exponent * (mul + m * self.giant), m * BABY_STEP_BYTES
+
+        # Herds, as set up by parallel_rho and parallel_kangaroo
+        if solver == "rho":
+            dp_bits = width.bit_length() // 4
+            # sqrt(pi*width/4) steps with the negation map
+            steps = 0.886 * root
+            # Every walk starts, and starts again after each
+            # distinguished point, from a*P + b*Q
+            starts = RHO_WALKS + steps / cores / (1 << dp_bits)
+            setup = (1.5 * PARTITION + starts) * mul
+            step = self.rho
+        elif solver == "kangaroo":
+            dp_bits = max(0, (root // (8 * RHO_WALKS * cores)).bit_length() - 1)
+            steps = 2 * root
+            # Jumps, and a start of every kangaroo
+            setup = (2 + RHO_WALKS) * mul
+            step = self.walk
+        else:
+            raise ValueError(f"Unknown solver {solver}, expected one of {SOLVERS}")
+        # Each herd walks on to its next distinguished point
+        process_steps = steps / cores + (RHO_WALKS << dp_bits)
+        seconds = setup + process_steps * step + (self.pool if cores > 1 else 0)
+        memory = (steps / (1 << dp_bits) + RHO_WALKS * cores) * DISTINGUISHED_POINT_BYTES
+        return exponent * seconds, int(memory)
+
+
+class PlanStep:
+    """
+    One solve of the plan, either d mod pi^ei for a
+    prime of the order, or the rest of d from its
+    interval when pi is None
+    """
+
+    def __init__(self, pi, ei, width, solver, cores, estimate, memory):
+        self.pi = pi
+        self.ei = ei
+        self.width = width
+        self.solver = solver
+        self.cores = cores
+        self.estimate = estimate
+        self.memory = memory
+        self.actual = None
+
+    def dlog(self):
+        processes = self.cores if self.cores > 1 else None
+        if self.solver == "trial":
+            return discrete_log_trial
+        if self.solver == "bsgs":
+            return bsgs
+        if self.solver == "rho":
+            return partial(parallel_rho, processes=processes)
+        return partial(parallel_kangaroo, processes=processes)
+
+    def __str__(self):
+        target = f"{self.pi}^{self.ei}" if self.pi else f"interval 2^{self.width.bit_length()}"
+        actual = "-" if self.actual is None else f"{self.actual:.3f}s"
+        return (f"{target:>24} {self.solver:>8} {self.cores:>5} {self.memory / 2**20:>10.1f}MB "
+                f"{self.estimate:>10.3f}s {actual:>10}")
+
+
+class Plan:
+    """
+    Solver choices for every step of a Pohlig-Hellman
+    solve, see plan(). run() carries the plan out and
+    records the time of every step next to its estimate.
+    """
+
+    def __init__(self, n, n_factors, steps, interval=None):
+        self.n = n
+        self.n_factors = n_factors
+        self.steps = steps
+        self.interval = interval
+
+    @property
+    def estimate(self):
+        return sum(step.estimate for step in self.steps)
+
+    def __str__(self):
+        header = f"{'step':>24} {'solver':>8} {'cores':>5} {'memory':>12} {'estimate':>11} {'actual':>10}"
+        return "\n".join([header] + [str(step) for step in self.steps])
+
+    def run(self, P, Q, report=None):
+        """
+        Solve Q = d*P following the plan, report is
+        called with every step once it is done
+        """
+        n = self.n
+        P.precompute(n.bit_length())
+        Q.precompute(n.bit_length())
+
+        dlogs, solved = [], []
+        x = None
+        for step in self.steps:
+            start = perf_counter()
+            if step.pi is not None:
+                dlogs.append(_pohlig_hellman_step(P, Q, n, step.pi, step.ei, dlog=step.dlog()))
+                solved.append((step.pi, step.ei))
+            else:
+                N = prod(p ** e for p, e in solved)
+                x = crt(dlogs, solved, N) if solved else 0
+                x = self._interval_step(P, Q, x, N, step)
+            step.actual = perf_counter() - start
+            if report is not None:
+                report(step)
+
+        if x is not None:
+            return x
+        # Steps may be out of the order of n_factors
+        return crt(dlogs, solved, n)
+
+    def _interval_step(self, P, Q, x, N, step):
+        """
+        With d = x mod N, solve d = x + N*t for the
+        t which puts d in the interval
+        """
+        lower, upper = self.interval
+        t_lower = -((x - lower) // N)
+        t_upper = (upper - 1 - x) // N + 1
+        E = P.curve
+        PN = N * P
+        QN = E.multi_scalar_mul((P, Q), (-x % self.n, 1))
+        if step.solver == "bsgs":
+            t = bsgs(PN, QN - t_lower * PN, self.n, upper_bound=t_upper - t_lower)
+            t = None if t is None else t + t_lower
+        else:
+            t = step.dlog()(PN, QN, self.n, upper_bound=t_upper, lower_bound=t_lower)
+        if t is None:
+            raise ValueError(f"No solution in the interval [{lower}, {upper})")
+        return x + N * t
+
+
+def _best(costs, width, exponent, memory, cores, solvers):
+    """
+    Cheapest (seconds, solver, cores, bytes) within
+    the memory budget
+    """
+    options = []
+    for solver in solvers:
+        # The walks fall back to bsgs below this size
+        if solver in ("rho", "kangaroo") and isqrt(width) < PARTITION:
+            continue
+        for c in {1, cores} if solver in ("rho", "kangaroo") else {1}:
+            seconds, size = costs.estimate(solver, width, exponent, c)
+            if size <= memory:
+                options.append((seconds, solver, c, size))
+    if not options:
+        raise ValueError(f"No solver fits in {memory} bytes for a log below {width}")
+    return min(options)
+
+
+def plan(P, n, n_factors, interval=None, memory=None, cores=None, costs=None):
+    """
+    Choose a solver for every prime power of n with the
+    cost model of the curve of P, given the memory in
+    bytes and cores to use.
+
+    With d known to lie in interval = (lower, upper),
+    only the cheapest primes are solved, and the rest
+    of d is found from the interval when that is faster.
+    """
+    memory = available_memory() if memory is None else memory
+    cores = cores or os.cpu_count() or 1
+    costs = costs or CostModel.calibrate(P, n)
+
+    steps = []
+    for pi, ei in n_factors:
+        # Every prime takes a few multiples of P and Q
+        overhead = (3 + 1.5 * ei) * costs.mul
+        seconds, solver, c, size = _best(costs, pi, ei, memory, cores, SOLVERS)
+        steps.append(PlanStep(pi, ei, pi, solver, c, overhead + seconds, size))
+
+    if interval is None:
+        return Plan(n, n_factors, steps)
+
+    # Solve the cheapest primes first, then try the
+    # interval after each number of them
+    steps.sort(key=lambda step: step.estimate)
+    lower, upper = interval
+    best_seconds, best = sum(step.estimate for step in steps), (len(steps), None)
+    N, spent = 1, 0
+    for k in range(len(steps)):
+        width = (upper - lower) // N + 2
+        seconds, solver, c, size = _best(costs, width, 1, memory, cores, ("bsgs", "kangaroo"))
+        seconds += 2 * costs.mul
+        if spent + seconds < best_seconds:
+            best_seconds, best = spent + seconds, (k, PlanStep(None, None, width, solver, c, seconds, size))
+        N *= steps[k].pi ** steps[k].ei
+        spent += steps[k].estimate
+
+    k, interval_step = best
+    steps = steps[:k]
+    if interval_step is not None:
+        steps.append(interval_step)
+    return Plan(n, n_factors, steps, interval)
+
+
+def planned_pohlig_hellman(P, Q, n, n_factors, interval=None, memory=None, cores=None, report=None):
+    """
+    Solve Q = d*P with the solvers chosen by plan(),
+    see Plan.run for `report`
+    """
+    return plan(P, n, n_factors, interval, memory, cores).run(P, Q, report)
@@ -0,0 +1,59 @@
+import random
+from time import perf_counter
+from discrete_log import crt, baby_step_cache
+from planner import CostModel, Plan, PlanStep
+from projective_ecdlp_test import easy, medium, challenge
+
+# Estimates of the cost model and the mean of a few
+# measured times agree within this factor, which
+# leaves room for a machine busy while calibrating
+ESTIMATE_FACTOR = 2.5
+
+
+def _interval_plan(solved, width, solver):
+    # Plan solving the prime powers `solved`, then the
+    # rest of d from an interval of the given width
+    steps = [PlanStep(pi, ei, pi, "trial", 1, 0, 0) for pi, ei in solved]
+    steps.append(PlanStep(None, None, width, solver, 1, 0, 0))
+    return steps
+
+
+def test_crt_one_modulus():
+    assert crt([5], [(7, 1)], 7) == 5
+    assert crt([12], [(3, 2)], 9) == 3
+
+
+def test_interval_after_one_prime(data=easy):
+    # One prime solved before the interval, where crt
+    # gets a single modulus
+    random.seed(0)
+    _, P, _ = challenge(data)
+    lower = 10 ** 6
+    interval = (lower, lower + 2 ** 21)
+    for solver in ("kangaroo", "bsgs"):
+        for _ in range(3):
+            d = random.randrange(*interval)
+            steps = _interval_plan([(7, 1)], 2 ** 21 // 7 + 2, solver)
+            plan = Plan(data['n'], data['n_factors'], steps, interval)
+            assert plan.run(P, d * P) == d
+
+
+def test_estimates(data=medium, samples=4):
+    # The largest prime of medium, where rho was
+    # estimated 3x too fast without a real walk
+    random.seed(0)
+    _, P, _ = challenge(data)
+    costs = CostModel.calibrate(P, data['n'])
+    pi = data['n_factors'][-1][0]
+    G = (data['n'] // pi) * P
+    for solver in ("bsgs", "rho"):
+        step = PlanStep(pi, 1, pi, solver, 1, 0, 0)
+        start = perf_counter()
+        for _ in range(samples):
+            baby_step_cache.clear()
+            d = random.randrange(pi)
+            assert step.dlog()(G, d * G, data['n'], upper_bound=pi) == d
+        actual = (perf_counter() - start) / samples
+        estimate, _ = costs.estimate(solver, pi)
+        assert 1 / ESTIMATE_FACTOR < estimate / actual < ESTIMATE_FACTOR, (solver, estimate, actual)
+
@@ -1,12 +1,343 @@
 from gmpy2 import mpz, to_binary
+from instrument import NORMALISE_MULS, AFFINE_ADD_MULS
+
+
+def normalise_queue(queue):
+    # optimise for non-zero inverses
+    # optimise for our use case by generators
+    # NOTE: 1-index prefix for optimization
+    q = queue[0].curve.q
+    one = queue[0].curve.one
+    n = len(queue)
+    z_prod = 1
+    prefix = [1] * (n + 1)
+    for i, P in enumerate(queue):
+        z_prod = z_prod * P.z % q
+        prefix[i + 1] = prefix[i] * P.z % q
+    z_prod_inverse = pow(z_prod, -1, q)
+    counters = queue[0].curve.counters
+    if counters is not None:
+        counters.count("inversions")
+        counters.count("normalisations", n, NORMALISE_MULS)
+    # Scale so normalised points have z == one
+    if one != 1:
+        z_prod_inverse = z_prod_inverse * one % q
+    # Jacobian points scale x by 1/z^2 and y by 1/z^3
+    jacobian = queue[0].curve.coordinates == "jacobian"
+    # i = n - 1 separate
+    P = queue[n - 1]
+    cur_suffix = P.z
+    cur_inverse = prefix[n - 1] * z_prod_inverse % q
+    if jacobian:
+        zz_inverse = cur_inverse * cur_inverse % q
+        P.x = P.x * zz_inverse % q
+        P.y = P.y * zz_inverse * cur_inverse % q
+    else:
+        P.x = P.x * cur_inverse % q
+        P.y = P.y * cur_inverse % q
+    P.z = one
+    yield P
+    # 0 <= i <= n - 2
+    for i in range(n - 2, -1, -1):
+        P = queue[i]
+        z = P.z
+        cur_inverse = prefix[i] * cur_suffix * z_prod_inverse % q
+        cur_suffix = cur_suffix * z % q
+        if jacobian:
+            zz_inverse = cur_inverse * cur_inverse % q
+            P.x = P.x * zz_inverse % q
+            P.y = P.y * zz_inverse * cur_inverse % q
+        else:
+            P.x = P.x * cur_inverse % q
+            P.y = P.y * cur_inverse % q
+        P.z = one
+        yield P
+
+
+def normalise_all(queue):
+    """
+    Normalise every point of queue in place,
+    which must not hold the point at infinity
+    """
+    if queue:
+        for _ in normalise_queue(queue):
+            pass
+
+
+def batch_iadd_affine(points, others):
+    """
+    points[i] += others[i] in place for normalised points,
+    sharing one inversion across the batch. The results are
+    normalised again, so every step is an affine addition
+    with lambda = (y2 - y1) / (x2 - x1).
+    """
+    E = points[0].curve
+    q, one = E.q, E.one
+    # Montgomery's trick over the x differences. Pairs with
+    # P == +-Q or a point at infinity go through iadd_affine.
+    pending, prefix, special = [], [], []
+    prod = 1
+    for P, Q in zip(points, others):
+        if P.z == 0 or Q.z == 0:
+            special.append((P, Q))
+            continue
+        dx = (Q.x - P.x) % q
+        if not dx:
+            special.append((P, Q))
+            continue
+        pending.append((P, Q, dx))
+        prefix.append(prod)
+        prod = prod * dx % q
+
+    if pending:
+        inverse = pow(prod, -1, q)
+        if E.counters is not None:
+            E.counters.count("inversions")
+            E.counters.count("affine_additions", len(pending), AFFINE_ADD_MULS)
+        for (P, Q, dx), before in zip(reversed(pending), reversed(prefix)):
+            dx_inverse = inverse * before % q
+            inverse = inverse * dx % q
+            # The R of Montgomery residues cancels in lambda,
+            # put it back where lambda^2 meets the x-coordinates
+            lam = (Q.y - P.y) * dx_inverse % q
+            if one != 1:
+                x3 = (lam * lam % q * one - P.x - Q.x) % q
+            else:
+                x3 = (lam * lam - P.x - Q.x) % q
+            P.y = (lam * (P.x - x3) - P.y) % q
+            P.x = x3
+            P.fixed_base = None
+
+    for P, Q in special:
+        P.iadd_affine(Q).normalise_coordinates()
+    return points
+
+
+def wnaf(n, w):
+    """
+    Width-w NAF of n >= 0, least significant digit
+    first. Non-zero digits are odd with |d| < 2^(w-1)
+    and are followed by at least w - 1 zeros.
+    """
+    digits = []
+    window, half = 1 << w, 1 << (w - 1)
+    while n:
+        d = 0
+        if n & 1:
+            d = n & (window - 1)
+            if d >= half:
+                d -= window
+            n -= d
+        digits.append(d)
+        n >>= 1
+    return digits
+
+
+def wnaf_width(bits):
+    """
+    Window width balancing the size of the odd
+    multiples table against the number of additions
+    """
+    if bits < 24:
+        return 2
+    if bits < 64:
+        return 3
+    if bits < 160:
+        return 4
+    return 5
+
+
+def straus(points, scalars, w=None):
+    """
+    Computes sum(n*P) for scalars n > 0 by interleaving
+    the width-w NAFs of the scalars, so every term shares
+    one run of doublings. The odd multiples P, 3P, ...
+    of all points are normalised together so every
+    addition is a mixed addition, and the loop calls the
+    curve formulas directly rather than going through
+    __add__.
+    """
+    E = points[0].curve
+    if w is None:
+        w = wnaf_width(max(n.bit_length() for n in scalars))
+
+    # Odd multiples P, 3P, ..., (2^(w-1) - 1)P
+    tables = []
+    for P in points:
+        table = [P]
+        if w > 2:
+            P2 = P + P
+            for _ in range((1 << (w - 2)) - 1):
+                table.append(table[-1] + P2)
+        tables.append(table)
+    if any(T.is_inf() for table in tables for T in table):
+        # Small order point, no need to be clever
+        R = E.O
+        for P, n in zip(points, scalars):
+            R = R + P._double_and_add(n)
+        return R.normalise_coordinates()
+    normalise_all([T for table in tables for T in table if T.z != E.one])
+    negated = [[-T for T in table] for table in tables]
+
+    digits = [wnaf(n, w) for n in scalars]
+    double, madd = E._double, E._madd
+    R = None
+    for i in reversed(range(max(len(ds) for ds in digits))):
+        if R is not None:
+            R = double(R)
+        for table, neg, ds in zip(tables, negated, digits):
+            d = ds[i] if i < len(ds) else 0
+            if d:
+                T = table[d >> 1] if d > 0 else neg[-d >> 1]
+                if R is None:
+                    # T may be one of the points passed in
+                    R = T.copy()
+                    continue
+                S = madd(R, T)
+                # R == +-T or R is infinity, z is then
+                # zero and __add__ sorts out the result
+                if S.z == 0:
+                    S = R + T
+                R = S
+    if R is None:
+        return E.O
+    return R.normalise_coordinates()
+
+
+def pippenger_width(terms):
+    """
+    Bucket window for Pippenger's method, about
+    log2 of the number of terms
+    """
+    return max(2, terms.bit_length() - 2)
+
+
+def pippenger(points, scalars, c=None):
+    """
+    Computes sum(n*P) for scalars n > 0 with Pippenger's
+    bucket method. Each c-bit window of the scalars sorts
+    the points into 2^c - 1 buckets, and sum(d * B_d) over
+    the buckets costs 2^(c+1) additions by running sums.
+    """
+    E = points[0].curve
+    if c is None:
+        c = pippenger_width(len(points))
+    normalise_all([P for P in points if P.z != E.one])
+
+    mask = (1 << c) - 1
+    bits = max(n.bit_length() for n in scalars)
+    R = E.O
+    for shift in range((bits - 1) // c * c, -1, -c):
+        for _ in range(c):
+            R = E._double(R)
+        buckets = [E.O] * (1 << c)
+        for P, n in zip(points, scalars):
+            d = (n >> shift) & mask
+            if d:
+                buckets[d] = buckets[d] + P
+        running = total = E.O
+        for d in range(mask, 0, -1):
+            running = running + buckets[d]
+            total = total + running
+        R = R + total
+    return R.normalise_coordinates()
+
+
+# Default window of fixed base tables, a table for
+# bits-bit scalars holds about (bits/w + 1) * 2^(w-1)
+# points and a multiplication costs bits/w additions
+FIXED_BASE_WINDOW = 4
+
+
+class FixedBaseTable:
+    """
+    Precomputed multiples of a fixed point P for n*P
+    with |n| < 2^bits. Row i holds d * 2^(w*i) * P for
+    1 <= d <= 2^(w-1) as normalised points, so n*P is
+    one mixed addition per signed base 2^w digit of n
+    and needs no doublings.
+    """
+
+    def __init__(self, P, bits, w=FIXED_BASE_WINDOW):
+        self.P = P
+        self.bits = bits
+        self.w = w
+        E = P.curve
+        half = 1 << (w - 1)
+
+        # One more row than digits, as signed
+        # digits can carry past the top bit
+        rows = []
+        B = P.copy()
+        for _ in range(-(-bits // w) + 1):
+            row = [B]
+            for _ in range(half - 1):
+                row.append(row[-1] + B)
+            rows.append(row)
+            # 2^w * B = 2 * (2^(w-1) * B)
+            B = row[-1] + row[-1]
+
+        normalise_all([T for row in rows for T in row if not T.is_inf() and T.z != E.one])
+        self.rows = rows
+
+    def mul(self, n):
+        """
+        Computes n*P, scalars too large for
+        the table fall back to wnaf_mul
+        """
+        if n < 0:
+            return -self.mul(-n)
+        if n.bit_length() > self.bits:
+            return self.P.wnaf_mul(n)
+
+        E = self.P.curve
+        madd = E._madd
+        w, half = self.w, 1 << (self.w - 1)
+        mask = (1 << w) - 1
+        R = None
+        for row in self.rows:
+            if not n:
+                break
+            # Signed digit -2^(w-1) < d <= 2^(w-1)
+            d = n & mask
+            if d > half:
+                d -= 1 << w
+            n = (n - d) >> w
+            if d == 0:
+                continue
+            T = row[d - 1] if d > 0 else E._neg(row[-d - 1])
+            if T.is_inf():
+                continue
+            if R is None:
+                # Never hand out the table's own points
+                R = T.copy()
+                continue
+            S = madd(R, T)
+            # As in wnaf_mul, z is zero when R == +-T
+            # or R is infinity
+            if S.z == 0:
+                S = R + T
+            R = S
+        if R is None:
+            return E.O
+        return R.normalise_coordinates()
+
+    def __len__(self):
+        return sum(len(row) for row in self.rows)
 
 
 class EllipticCurvePoint:
+    # No per point __dict__, the formulas
+    # create points on every step
+    __slots__ = ("curve", "x", "y", "z", "fixed_base")
+
     def __init__(self, E, x, y, z, check=True):
         self.curve = E
         self.x = x
         self.y = y
         self.z = z
+        # FixedBaseTable set by precompute
+        self.fixed_base = None
 
         # Removing this check saves time
         if check:
@@ -17,22 +348,28 @@ class EllipticCurvePoint:
         return self.z == 0
 
     def normalise_coordinates(self):
-        if self.z == 1 or self.z == 0:
+        one = self.curve.one
+        if self.z == one or self.z == 0:
             return self
         try:
             z_inverse = pow(self.z, -1, self.curve.q)
         except:
             raise ValueError(f"Point cannot be scaled as gcd({self.z}, {self.curve.q}) != 1")
+        if self.curve.counters is not None:
+            self.curve.counters.count("inversions")
+            self.curve.counters.count("normalisations", 1, NORMALISE_MULS)
+        if one != 1:
+            z_inverse = z_inverse * one % self.curve.q
         self.x = (self.x * z_inverse) % self.curve.q
         self.y = (self.y * z_inverse) % self.curve.q
-        self.z = 1
+        self.z = one
         return self
 
     def compress(self):
         if self.is_inf():
             return bytes([0])
-        self.normalise_coordinates()
-        return bytes([2 + (self.y & 1)]) + to_binary(mpz(self.x))
+        x, y = self.to_tuple()
+        return bytes([2 + (y & 1)]) + to_binary(mpz(x))
 
     def to_tuple(self):
         if self.is_inf():
@@ -57,7 +394,7 @@ class EllipticCurvePoint:
 
         # Check the underlying points are on the same curve
         # Removing this type check will save time
-        if not self.curve == other.curve:
+        if self.curve is not other.curve and self.curve != other.curve:
             raise ValueError("Points are not defined over the same curve")
 
         # Easy cases when one point is the point at infinity
@@ -67,16 +404,17 @@ class EllipticCurvePoint:
             return other
 
         # Addition, logic based on Pz, Qz values
+        one = self.curve.one
         if self == other:
-            if self.z == 1:
+            if self.z == one:
                 # Double when Z = 1
                 return self.curve._mdouble(self)
             else:
                 # Standard doubling
                 return self.curve._double(self)
 
-        if other.z == 1:
-            if self.z == 1:
+        if other.z == one:
+            if self.z == one:
                 # Addition when Z1 = Z2 = 1
                 return self.curve._mmadd(self, other)
             else:
@@ -90,6 +428,26 @@ class EllipticCurvePoint:
         self = self + other
         return self
 
+    def iadd_affine(self, other):
+        """
+        self += other in place for a normalised
+        other, without creating a new point.
+        Drops any fixed base table of self.
+        """
+        if other.is_inf():
+            return self
+        self.fixed_base = None
+        if self.is_inf() or not self.curve._imadd(self, other):
+            # P == +-other, or P is infinity
+            if self is self.curve.O:
+                raise ValueError("The curve's point at infinity cannot be updated in place, use a copy")
+            R = self + other
+            self.x, self.y, self.z = R.x, R.y, R.z
+        return self
+
+    def copy(self):
+        return self.__class__(self.curve, self.x, self.y, self.z, check=False)
+
     def __sub__(self, other):
         return self + (-other)
 
@@ -101,7 +459,35 @@ class EllipticCurvePoint:
         # Removing this type check will save time.
         if not isinstance(n, int):
             raise TypeError(f"Scalar multiplication must be done using an integer.")
+        if self.fixed_base is not None:
+            return self.fixed_base.mul(n)
+        return self.wnaf_mul(n, self.curve.window)
 
+    def precompute(self, bits=None, w=FIXED_BASE_WINDOW):
+        """
+        Attach a FixedBaseTable to this point, later n*P
+        with |n| < 2^bits read from it. Larger w trades
+        memory for fewer additions. Returns the table.
+        """
+        if bits is None:
+            bits = self.curve.q.bit_length() + 1
+        table = self.fixed_base
+        if table is None or table.bits < bits or table.w != w:
+            self.fixed_base = FixedBaseTable(self, bits, w)
+        return self.fixed_base
+
+    def wnaf_mul(self, n, w=None):
+        """
+        Computes n*P from the width-w NAF of n, the
+        single term case of straus
+        """
+        if n < 0:
+            return (-self).wnaf_mul(-n, w)
+        if n == 0 or self.is_inf():
+            return self.curve.O
+        return straus([self], [n], w)
+
+    def _double_and_add(self, n):
         Q = self
         R = self.curve.O
         # Deal with negative scalar multiplication
@@ -118,6 +504,13 @@ class EllipticCurvePoint:
     def __rmul__(self, lhs):
         return self * lhs
 
+    def __reduce__(self):
+        """
+        Pickle as (curve, x, y, z) and skip the
+        on curve check when loading
+        """
+        return (self.__class__, (self.curve, self.x, self.y, self.z, False))
+
     def __hash__(self):
         return hash(self.to_tuple())
         # return hash(str(self))
@@ -131,5 +524,61 @@ class EllipticCurvePoint:
     def __str__(self):
         if self.is_inf():
             return "(0 : 1 : 0)"
+        x, y = self.to_tuple()
+        return (f"({x} : {y} : 1)")
+
+
+class MontgomeryFormPoint(EllipticCurvePoint):
+    """
+    Point with coordinates held as Montgomery residues,
+    normalised points have z == R mod q and the usual
+    coordinates only come back out of to_tuple
+    """
+    __slots__ = ()
+
+    def to_tuple(self):
+        if self.is_inf():
+            return (-1, -1)
         self.normalise_coordinates()
-        return (f"({self.x} : {self.y} : 1)")
+        field = self.curve.field
+        return (field.from_field(self.x), field.from_field(self.y))
+
+
+
+class JacobianPoint(EllipticCurvePoint):
+    """
+    Point in Jacobian coordinates, (x, y, z)
+    is the affine point (x/z^2, y/z^3)
+    """
+    __slots__ = ()
+
+    def normalise_coordinates(self):
+        if self.z == 1 or self.z == 0:
+            return self
+        try:
+            z_inverse = pow(self.z, -1, self.curve.q)
+        except:
+            raise ValueError(f"Point cannot be scaled as gcd({self.z}, {self.curve.q}) != 1")
+        if self.curve.counters is not None:
+            self.curve.counters.count("inversions")
+            self.curve.counters.count("normalisations", 1, NORMALISE_MULS)
+        zz_inverse = z_inverse * z_inverse % self.curve.q
+        self.x = (self.x * zz_inverse) % self.curve.q
+        self.y = (self.y * zz_inverse * z_inverse) % self.curve.q
+        self.z = 1
+        return self
+
+    def __eq__(self, other):
+        # Removing this type check will save time.
+        if isinstance(other, EllipticCurvePoint):
+            if self.z == 0 or other.z == 0:
+                return self.z == other.z
+            q = self.curve.q
+            z1z1, z2z2 = self.z * self.z, other.z * other.z
+            # Most comparisons fail on x, skip y when they do
+            if (self.x * z2z2 - other.x * z1z1) % q:
+                return False
+            return (self.y * z2z2 * other.z - other.y * z1z1 * self.z) % q == 0
+        return False
+
+    __hash__ = EllipticCurvePoint.__hash__
\ No newline at end of file
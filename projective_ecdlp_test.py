@@ -30,7 +30,7 @@ from curve import EllipticCurve
 from discrete_log import pohlig_hellman, bsgs, discrete_log_rho
 
 
-def test(data, check_times, dlog=bsgs, profile=False, progress=False):
+def test(data, check_times, dlog=bsgs, profile=False, progress=False, processes=None):
     p = data["p"]
     a = data["a"]
     b = data["b"]
@@ -55,7 +55,7 @@ def test(data, check_times, dlog=bsgs, profile=False, progress=False):
     
     for _ in tq:
         t = time.time()
-        _d = pohlig_hellman(P, Q, n, n_factors, dlog=dlog)
+        _d = pohlig_hellman(P, Q, n, n_factors, dlog=dlog, processes=processes)
         time_taken = time.time() - t
         total_time += time_taken
         assert _d == d
@@ -109,6 +109,24 @@ hard = {
     "d": 3943544205328749264434177719074374035314915664326936412021520273127793155287,
 }
 
+
+def challenge(data, **kwargs):
+    """
+    Curve of a challenge and its points P and Q,
+    kwargs are passed on to EllipticCurve
+    """
+    E = EllipticCurve(data['p'], data['a'], data['b'], **kwargs)
+    return E, E(data['Px'], data['Py']), E(data['Qx'], data['Qy'])
+
+
+def subgroup(data, pi):
+    """
+    Generator of the subgroup of prime order pi
+    """
+    _, P, _ = challenge(data)
+    return (data['n'] // pi) * P
+
+
 if __name__ == '__main__':
     # (15) 0.568s
     # (15) 1.574s
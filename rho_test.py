@@ -0,0 +1,34 @@
+import random
+import pytest
+from discrete_log import discrete_log_rho
+from parallel import parallel_rho
+from projective_ecdlp_test import medium, subgroup
+
+
+def test_parallel_rho(data=medium, pi=3841283, samples=3):
+    random.seed(0)
+    G = subgroup(data, pi)
+    for processes in (None, 2):
+        for _ in range(samples):
+            d = random.randrange(pi)
+            assert parallel_rho(G, d * G, data['n'], upper_bound=pi, processes=processes) == d
+
+
+def test_not_in_subgroup(data=medium, pi=3841283):
+    # Q from another subgroup has no log, every solver
+    # gives up with a ValueError
+    G = subgroup(data, pi)
+    H = subgroup(data, 2952361)
+    for dlog, options in ((discrete_log_rho, {}), (parallel_rho, {}), (parallel_rho, {"processes": 2})):
+        with pytest.raises(ValueError):
+            dlog(G, H, data['n'], upper_bound=pi, **options)
+
+
+def test_without_bound(data=medium, pi=3841283, samples=3):
+    # n is the order of G, and the walks are modulo n
+    random.seed(1)
+    G = subgroup(data, pi)
+    for dlog in (discrete_log_rho, parallel_rho):
+        for _ in range(samples):
+            d = random.randrange(pi)
+            assert dlog(G, d * G, pi) == d
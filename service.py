@@ -0,0 +1,181 @@
+import asyncio
+import multiprocessing
+import os
+from time import perf_counter
+from curve import EllipticCurve
+from discrete_log import bsgs, crt, _pohlig_hellman_step
+
+
+class ProgressEvent:
+    """
+    A prime power of a job is solved, with d = xi
+    mod pi^ei, `elapsed` seconds after the job started
+    """
+
+    def __init__(self, pi, ei, xi, elapsed, solved, total):
+        self.pi = pi
+        self.ei = ei
+        self.xi = xi
+        self.elapsed = elapsed
+        self.solved = solved
+        self.total = total
+
+    def __repr__(self):
+        return f"ProgressEvent({self.pi}^{self.ei}, {self.solved}/{self.total}, {self.elapsed:.3f}s)"
+
+
+def _job_worker(conn, P, Q, n, n_factors, dlog):
+    """
+    Solve one job in a worker process, sending a
+    progress message after every prime power
+    """
+    try:
+        start = perf_counter()
+        P.precompute(n.bit_length())
+        Q.precompute(n.bit_length())
+        dlogs = []
+        for pi, ei in n_factors:
+            xi = _pohlig_hellman_step(P, Q, n, pi, ei, dlog=dlog)
+            dlogs.append(xi)
+            conn.send(("progress", pi, ei, xi, perf_counter() - start))
+        conn.send(("done", crt(dlogs, n_factors, n)))
+    except Exception as e:
+        conn.send(("error", e))
+    finally:
+        conn.close()
+
+
+class DiscreteLogJob:
+    """
+    A submitted job. Await it for d, iterate over
+    progress() for a ProgressEvent per prime power,
+    or cancel() it, which stops its worker process.
+    """
+
+    def __init__(self, total):
+        self.total = total
+        self.events = []
+        self._changed = asyncio.Event()
+        self._task = None
+
+    def __await__(self):
+        return self._task.__await__()
+
+    def cancel(self):
+        return self._task.cancel()
+
+    def done(self):
+        return self._task.done()
+
+    def _add(self, event):
+        self.events.append(event)
+        self._changed.set()
+
+    async def progress(self):
+        """
+        Yield every ProgressEvent of the job in
+        order, until the job is finished
+        """
+        seen = 0
+        while True:
+            while seen < len(self.events):
+                seen += 1
+                yield self.events[seen - 1]
+            if self._task.done():
+                return
+            self._changed.clear()
+            # Wake on the next event or the end of the job
+            waiter = asyncio.ensure_future(self._changed.wait())
+            await asyncio.wait((waiter, self._task), return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+
+
+class DiscreteLogService:
+    """
+    asyncio front end for Pohlig-Hellman jobs. Every job
+    runs in its own worker process, at most `processes`
+    at a time, so a job can be cancelled or timed out
+    by terminating its worker. Failures in a job come
+    back as the exception raised by awaiting it.
+
+    Use within a running event loop, ideally as
+    `async with DiscreteLogService() as service:`
+    """
+
+    def __init__(self, processes=None, context=None):
+        self.processes = processes or os.cpu_count() or 1
+        self._context = context or multiprocessing.get_context()
+        self._slots = asyncio.Semaphore(self.processes)
+        self._jobs = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def submit(self, curve, P, Q, n, n_factors, dlog=bsgs, timeout=None):
+        """
+        Submit the job Q = d*P. `curve` is an EllipticCurve or
+        the parameters (p, a, b), and P and Q are points or
+        their affine coordinates (x, y). `timeout` is counted
+        from when the job starts in a worker, a job out of
+        time raises TimeoutError.
+        """
+        if not isinstance(curve, EllipticCurve):
+            curve = EllipticCurve(*curve)
+        P, Q = (X if not isinstance(X, tuple) else curve(*X) for X in (P, Q))
+
+        job = DiscreteLogJob(len(n_factors))
+        job._task = asyncio.ensure_future(self._run(job, (P, Q, n, n_factors, dlog), timeout))
+        self._jobs.add(job._task)
+        job._task.add_done_callback(self._jobs.discard)
+        return job
+
+    async def close(self):
+        """
+        Cancel every unfinished job
+        """
+        for task in list(self._jobs):
+            task.cancel()
+        await asyncio.gather(*self._jobs, return_exceptions=True)
+
+    async def _run(self, job, args, timeout):
+        async with self._slots:
+            receiver, sender = self._context.Pipe(duplex=False)
+            process = self._context.Process(target=_job_worker, args=(sender, *args), daemon=True)
+            process.start()
+            sender.close()
+            try:
+                return await asyncio.wait_for(self._receive(job, receiver), timeout)
+            finally:
+                # Stops the work of a cancelled job
+                if process.is_alive():
+                    process.terminate()
+                await asyncio.get_running_loop().run_in_executor(None, process.join)
+                receiver.close()
+
+    async def _receive(self, job, receiver):
+        loop = asyncio.get_running_loop()
+        # The loop wakes us when the pipe has a message or
+        # is closed, so no thread sits blocked in recv
+        readable = asyncio.Event()
+        loop.add_reader(receiver.fileno(), readable.set)
+        try:
+            while True:
+                await readable.wait()
+                readable.clear()
+                while receiver.poll():
+                    try:
+                        message = receiver.recv()
+                    except EOFError:
+                        raise RuntimeError("Discrete log worker exited without a result") from None
+                    kind, *values = message
+                    if kind == "progress":
+                        job._add(ProgressEvent(*values, len(job.events) + 1, job.total))
+                    elif kind == "done":
+                        return values[0]
+                    else:
+                        raise values[0]
+        finally:
+            loop.remove_reader(receiver.fileno())
@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from service import DiscreteLogService
+from projective_ecdlp_test import easy, hard, challenge
+
+
+def failing_dlog(P, Q, n, upper_bound=None):
+    raise ArithmeticError("no log")
+
+
+def submit(service, data, **kwargs):
+    E, P, Q = challenge(data)
+    return service.submit(E, P, Q, data['n'], data['n_factors'], **kwargs)
+
+
+def test_progress(data=easy):
+    async def run():
+        async with DiscreteLogService(processes=2) as service:
+            job = submit(service, data)
+            events = [event async for event in job.progress()]
+            return events, await job
+
+    events, d = asyncio.run(run())
+    assert d == data['d']
+    # One event per prime power, in order
+    assert [(e.pi, e.ei) for e in events] == data['n_factors']
+    assert [e.solved for e in events] == list(range(1, len(events) + 1))
+    for e in events:
+        assert data['d'] % e.pi ** e.ei == e.xi
+
+
+def test_timeout(data=hard):
+    async def run():
+        async with DiscreteLogService(processes=1) as service:
+            with pytest.raises(asyncio.TimeoutError):
+                await submit(service, data, timeout=0.5)
+            # The slot is free again for the next job
+            assert await submit(service, easy) == easy['d']
+
+    asyncio.run(run())
+
+
+def test_cancel(data=hard):
+    async def run():
+        async with DiscreteLogService(processes=1) as service:
+            job = submit(service, data)
+            await asyncio.sleep(0.5)
+            job.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await job
+            assert job.done()
+            assert await submit(service, easy) == easy['d']
+
+    asyncio.run(run())
+
+
+def test_error(data=easy):
+    async def run():
+        async with DiscreteLogService(processes=1) as service:
+            with pytest.raises(ArithmeticError):
+                await submit(service, data, dlog=failing_dlog)
+
+    asyncio.run(run())
@@ -0,0 +1,302 @@
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+import mmap
+import os
+import struct
+import sys
+from curve import EllipticCurve
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# File layout: magic, m, count, the curve and
+# generator as length prefixed integers, the names
+# of the curve's field and coordinates, padding to
+# 8 bytes, then count fingerprints and count
+# indices as little endian uint64
+TABLE_MAGIC = b"ECBSGS01"
+TABLE_HEADER = struct.Struct("<8sQQ")
+TABLE_INT_LENGTH = struct.Struct("<I")
+
+# Fingerprints are the low 64 bits of
+# the normalised x-coordinate
+FINGERPRINT_BITS = 64
+FINGERPRINT_MASK = (1 << FINGERPRINT_BITS) - 1
+
+
+def fingerprint(x):
+    return int(x & FINGERPRINT_MASK)
+
+
+class BabyStepTable:
+    """
+    Baby steps i*P for 1 <= i <= m//2 stored as sorted
+    64-bit fingerprints of x(i*P) next to their indices.
+
+    As x(-i*P) == x(i*P), a table of half the size
+    resolves any point of the form +-i*P with i < m.
+    """
+
+    def __init__(self, P, m, fingerprints, indices, path=None):
+        self.P = P
+        self.m = m
+        self.fingerprints = fingerprints
+        self.indices = indices
+        # Set when the arrays are views of a mapped file
+        self.path = path
+
+    @classmethod
+    def from_pairs(cls, P, m, pairs):
+        """
+        Build the table from (x, i) pairs with
+        x the normalised x-coordinate of i*P
+        """
+        # Pack each pair into one int so the sort
+        # runs on plain ints rather than tuples
+        packed = [(fingerprint(x) << FINGERPRINT_BITS) | i for x, i in pairs]
+        return cls._from_packed(P, m, packed)
+
+    @classmethod
+    def merge(cls, P, m, tables):
+        """
+        Merge the shards of a table built
+        over disjoint ranges of indices
+        """
+        packed = []
+        for table in tables:
+            packed.extend((fp << FINGERPRINT_BITS) | i for fp, i in zip(table.fingerprints, table.indices))
+        return cls._from_packed(P, m, packed)
+
+    @classmethod
+    def _from_packed(cls, P, m, packed):
+        packed.sort()
+        fingerprints = array('Q', (v >> FINGERPRINT_BITS for v in packed))
+        indices = array('Q', (v & FINGERPRINT_MASK for v in packed))
+        return cls(P, m, fingerprints, indices)
+
+    def lookup(self, R):
+        """
+        Return i with R == i*P for |i| <= m//2, or None.
+
+        R must be normalised and not the point at
+        infinity, which is never stored.
+        """
+        counters = self.P.curve.counters
+        if counters is not None:
+            counters.count("probes")
+        fp = fingerprint(R.x)
+        fingerprints = self.fingerprints
+        k = bisect_left(fingerprints, fp)
+        while k < len(fingerprints) and fingerprints[k] == fp:
+            i = self.indices[k]
+            # Fingerprints can collide, check the full point
+            Pi = i * self.P
+            if Pi.x == R.x:
+                return i if Pi.y == R.y else -i
+            k += 1
+        return None
+
+    def lookup_many(self, points):
+        """
+        Yield (k, i) with points[k] == i*P for every hit in
+        a block of normalised points, in order of k. The
+        fingerprints of the block are probed together, with
+        numpy when it is available.
+        """
+        fps = [fingerprint(R.x) for R in points]
+        fingerprints = self.fingerprints
+        if not len(fingerprints):
+            return
+        if np is not None:
+            table = np.frombuffer(fingerprints, dtype=np.uint64)
+            block = np.array(fps, dtype=np.uint64)
+            index = np.minimum(np.searchsorted(table, block), len(table) - 1)
+            candidates = np.flatnonzero(table[index] == block).tolist()
+        else:
+            candidates = []
+            for k, fp in enumerate(fps):
+                index = bisect_left(fingerprints, fp)
+                if index < len(fingerprints) and fingerprints[index] == fp:
+                    candidates.append(k)
+        counters = self.P.curve.counters
+        if counters is not None:
+            # Candidates are counted by lookup
+            counters.count("probes", len(points) - len(candidates))
+        for k in candidates:
+            if points[k].is_inf():
+                continue
+            i = self.lookup(points[k])
+            if i is not None:
+                yield k, i
+
+    def save(self, path):
+        """
+        Write the table to `path` in a fixed width
+        layout which `load` can map without copying
+        """
+        E = self.P.curve
+        x, y = self.P.to_tuple()
+        header = TABLE_HEADER.pack(TABLE_MAGIC, self.m, len(self))
+        for v in (E.q, E.a, E.b, x, y):
+            v = int(v).to_bytes((int(v).bit_length() + 7) // 8, 'little')
+            header += TABLE_INT_LENGTH.pack(len(v)) + v
+        # Fingerprints depend on how the field holds x
+        for name in (E.field.name, E.coordinates):
+            name = name.encode()
+            header += TABLE_INT_LENGTH.pack(len(name)) + name
+        header += bytes(-len(header) % 8)
+
+        fingerprints, indices = array('Q', self.fingerprints), array('Q', self.indices)
+        if sys.byteorder != 'little':
+            fingerprints.byteswap()
+            indices.byteswap()
+        with open(path, 'wb') as f:
+            f.write(header)
+            fingerprints.tofile(f)
+            indices.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Map a table written by `save`, the fingerprints
+        and indices stay in the page cache and are shared
+        by every process which maps the same file
+        """
+        if sys.byteorder != 'little':
+            raise ValueError("Mapped baby step tables need a little endian machine")
+        with open(path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, m, count = TABLE_HEADER.unpack_from(mm, 0)
+        if magic != TABLE_MAGIC:
+            raise ValueError(f"{path} is not a baby step table")
+        offset = TABLE_HEADER.size
+        values = []
+        for _ in range(5):
+            (length,) = TABLE_INT_LENGTH.unpack_from(mm, offset)
+            offset += TABLE_INT_LENGTH.size
+            values.append(int.from_bytes(mm[offset:offset + length], 'little'))
+            offset += length
+        names = []
+        for _ in range(2):
+            (length,) = TABLE_INT_LENGTH.unpack_from(mm, offset)
+            offset += TABLE_INT_LENGTH.size
+            names.append(mm[offset:offset + length].decode())
+            offset += length
+        offset += -offset % 8
+
+        q, a, b, x, y = values
+        field, coordinates = names
+        P = EllipticCurve(q, a, b, field=field, coordinates=coordinates)(x, y)
+        view = memoryview(mm)
+        fingerprints = view[offset:offset + 8 * count].cast('Q')
+        indices = view[offset + 8 * count:offset + 16 * count].cast('Q')
+        return cls(P, m, fingerprints, indices, path=path)
+
+    def __reduce__(self):
+        # Mapped tables are sent to other processes
+        # by path, each process maps its own view
+        if self.path is not None:
+            return (self.__class__.load, (self.path,))
+        return (self.__class__, (self.P, self.m, self.fingerprints, self.indices))
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def nbytes(self):
+        return len(self) * (self.fingerprints.itemsize + self.indices.itemsize)
+
+
+class BabyStepCache:
+    """
+    Least recently used cache of baby step tables keyed
+    by (curve, P, m). Tables are evicted once the cache
+    holds more than `max_bytes`, the most recent table
+    is always kept.
+
+    With `directory` set, tables missing from memory
+    are mapped from files in that directory and newly
+    built tables are saved there for later runs.
+    """
+
+    def __init__(self, max_bytes=2 ** 29, directory=None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.nbytes = 0
+        self.tables = OrderedDict()
+        self.lock = Lock()
+
+    @staticmethod
+    def key(P, m):
+        return (P.curve, P.to_tuple(), m)
+
+    def get(self, P, m):
+        key = self.key(P, m)
+        with self.lock:
+            table = self.tables.get(key)
+            if table is not None:
+                self.tables.move_to_end(key)
+            return table
+
+    def put(self, table):
+        key = self.key(table.P, table.m)
+        with self.lock:
+            if key in self.tables:
+                self.nbytes -= self.tables.pop(key).nbytes()
+            self.tables[key] = table
+            self.nbytes += table.nbytes()
+            while self.nbytes > self.max_bytes and len(self.tables) > 1:
+                _, evicted = self.tables.popitem(last=False)
+                self.nbytes -= evicted.nbytes()
+        return table
+
+    def get_or_build(self, P, m, build):
+        """
+        Cached table for (P, m), calling build(P, m)
+        on a miss. The build runs outside the lock.
+        """
+        table = self.get(P, m)
+        if table is not None:
+            return table
+
+        path = self.path(P, m)
+        if path is not None and os.path.exists(path):
+            return self.put(BabyStepTable.load(path))
+
+        table = build(P, m)
+        if path is not None:
+            # Write then rename, so other processes
+            # never map a half written file
+            tmp = f"{path}.{os.getpid()}.tmp"
+            table.save(tmp)
+            os.replace(tmp, path)
+        return self.put(table)
+
+    def path(self, P, m):
+        """
+        File for the table of (P, m) in `directory`
+        """
+        if self.directory is None:
+            return None
+        E = P.curve
+        x, y = P.to_tuple()
+        digest = sha256(repr((*E._invariants(), x, y, m)).encode()).hexdigest()
+        return os.path.join(self.directory, f"{digest[:32]}.bsgs")
+
+    def clear(self):
+        with self.lock:
+            self.tables.clear()
+            self.nbytes = 0
+
+    def __contains__(self, key):
+        P, m = key
+        with self.lock:
+            return self.key(P, m) in self.tables
+
+    def __len__(self):
+        return len(self.tables)
@@ -0,0 +1,69 @@
+import pickle
+import random
+import discrete_log
+from discrete_log import bsgs, bsgs_batch, build_baby_steps
+from tables import BabyStepCache, BabyStepTable
+from projective_ecdlp_test import easy, medium, subgroup
+
+
+def test_cache_eviction(data=easy, m=2 ** 10):
+    P = subgroup(data, 729196241)
+    tables = [build_baby_steps(k * P, m) for k in (1, 2, 3, 4)]
+    # Room for two tables
+    cache = BabyStepCache(max_bytes=2 * tables[0].nbytes())
+    cache.put(tables[0])
+    cache.put(tables[1])
+    assert len(cache) == 2
+    # Using the first makes the second the oldest
+    assert cache.get(tables[0].P, m) is tables[0]
+    cache.put(tables[2])
+    assert len(cache) == 2 and cache.nbytes <= cache.max_bytes
+    assert (tables[1].P, m) not in cache
+    assert (tables[0].P, m) in cache and (tables[2].P, m) in cache
+
+    # The most recent table stays even when too big
+    cache = BabyStepCache(max_bytes=1)
+    cache.put(tables[3])
+    assert len(cache) == 1
+
+
+def check_lookups(table, P, samples=10):
+    for i in random.sample(range(1, table.m // 2 + 1), samples):
+        R = (i * P).normalise_coordinates()
+        assert table.lookup(R) == i
+        assert table.lookup(-R) == -i
+
+
+def test_table_round_trip(tmp_path, data=easy, m=2 ** 12):
+    random.seed(0)
+    P = subgroup(data, 729196241)
+    table = build_baby_steps(P, m)
+    path = str(tmp_path / "table.bsgs")
+    table.save(path)
+
+    loaded = BabyStepTable.load(path)
+    assert loaded.path == path
+    assert loaded.m == m and loaded.P == P
+    assert list(loaded.fingerprints) == list(table.fingerprints)
+    assert list(loaded.indices) == list(table.indices)
+    check_lookups(loaded, P)
+
+    # In memory tables are pickled whole, mapped
+    # tables by path and mapped again
+    for original in (table, loaded):
+        copy = pickle.loads(pickle.dumps(original))
+        assert copy.path == original.path
+        assert list(copy.fingerprints) == list(table.fingerprints)
+        check_lookups(copy, P)
+
+
+def test_bsgs_batch(monkeypatch, data=medium, pi=3841283, samples=20):
+    random.seed(1)
+    G = subgroup(data, pi)
+    Qs = [d * G for d in (random.randrange(pi) for _ in range(samples))]
+    Qs.append(G.curve.O.copy())
+    expected = {k: bsgs(G, Q, data['n'], upper_bound=pi) for k, Q in enumerate(Qs)}
+    assert dict(bsgs_batch(G, Qs, data['n'], upper_bound=pi)) == expected
+    # The numpy giant steps for many targets
+    monkeypatch.setattr(discrete_log, "VECTOR_TARGETS", 1)
+    assert dict(bsgs_batch(G, Qs, data['n'], upper_bound=pi)) == expected
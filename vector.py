@@ -0,0 +1,243 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Limbs are held in int64, so products of two limbs
+# and the column sums of Montgomery reduction fit
+# without overflow for moduli up to ~1800 bits
+LIMB_BITS = 28
+LIMB_MASK = (1 << LIMB_BITS) - 1
+
+
+class VectorField:
+    """
+    Batches of residues modulo q in Montgomery form x*R,
+    R = 2^(LIMB_BITS * limbs), stored as int64 NumPy arrays
+    of shape (limbs, batch). Every operation runs over the
+    whole batch, one NumPy call per limb rather than one
+    Python call per element.
+    """
+
+    def __init__(self, q):
+        if np is None:
+            raise ImportError("VectorField needs numpy")
+        self.q = int(q)
+        self.limbs = -(-self.q.bit_length() // LIMB_BITS)
+        self.R = 1 << (LIMB_BITS * self.limbs)
+        self.R_inverse = pow(self.R, -1, self.q)
+        # q * q_prime == -1 mod 2^LIMB_BITS
+        self.q_prime = -pow(self.q, -1, 1 << LIMB_BITS) % (1 << LIMB_BITS)
+        self.q_limbs = self.split([self.q])
+
+    def split(self, xs):
+        """
+        Limbs of the integers xs as a (limbs, len(xs)) array
+        """
+        xs = [int(x) for x in xs]
+        X = np.empty((self.limbs, len(xs)), dtype=np.int64)
+        for i in range(self.limbs):
+            shift = i * LIMB_BITS
+            X[i] = [(x >> shift) & LIMB_MASK for x in xs]
+        return X
+
+    def join(self, X):
+        """
+        Integers from the limbs of X
+        """
+        xs = [0] * X.shape[1]
+        for i in reversed(range(self.limbs)):
+            xs = [(x << LIMB_BITS) | limb for x, limb in zip(xs, X[i].tolist())]
+        return xs
+
+    def to_vector(self, xs):
+        return self.split([x * self.R % self.q for x in xs])
+
+    def from_vector(self, X):
+        return [x * self.R_inverse % self.q for x in self.join(X)]
+
+    def one(self, n):
+        return np.repeat(self.split([self.R % self.q]), n, axis=1)
+
+    def to_plain(self, X):
+        """
+        Limbs of the residues x from X = x*R, which
+        unlike join needs no Python loop over the batch
+        """
+        return self.mul(X, self.split([1]))
+
+    def low64(self, X):
+        """
+        Low 64 bits of every element of X as uint64
+        """
+        U = X.astype(np.uint64)
+        low = U[0].copy()
+        for i in range(1, min(self.limbs, -(-64 // LIMB_BITS))):
+            low |= U[i] << np.uint64(i * LIMB_BITS)
+        return low
+
+    def is_zero(self, X):
+        return ~X.any(axis=0)
+
+    def _carry(self, T):
+        # Bring every limb but the top into [0, 2^LIMB_BITS),
+        # the shift is arithmetic so borrows carry too
+        for i in range(T.shape[0] - 1):
+            T[i + 1] += T[i] >> LIMB_BITS
+            T[i] &= LIMB_MASK
+        return T
+
+    def _reduce(self, T):
+        """
+        T mod q for carried T with 0 <= T < 2q
+        """
+        D = self._carry(T - self.q_limbs)
+        # The top limb is negative when T < q
+        return np.where(D[-1] < 0, T, D)
+
+    def add(self, X, Y):
+        return self._reduce(self._carry(X + Y))
+
+    def sub(self, X, Y):
+        T = self._carry(X - Y)
+        T = np.where(T[-1] < 0, T + self.q_limbs, T)
+        return self._carry(T)
+
+    def mul(self, X, Y):
+        """
+        X*Y*R^-1 with Montgomery reduction, one
+        limb of X and one limb of the reduction
+        factor at a time
+        """
+        L = self.limbs
+        # Either side may be a single broadcast column
+        T = np.zeros((2 * L + 1, max(X.shape[1], Y.shape[1])), dtype=np.int64)
+        for i in range(L):
+            T[i:i + L] += X[i] * Y
+        for i in range(L):
+            m = ((T[i] & LIMB_MASK) * self.q_prime) & LIMB_MASK
+            T[i:i + L] += m * self.q_limbs
+            # T[i] is now a multiple of 2^LIMB_BITS
+            T[i + 1] += T[i] >> LIMB_BITS
+        return self._reduce(self._carry(T[L:2 * L].copy()))
+
+    def inverse(self, X):
+        """
+        Inverse of every element of X, with a product tree
+        so the batch costs one Python inversion and about
+        three multiplications per element. Raises ValueError
+        if any element is zero.
+        """
+        n = X.shape[1]
+        # Pad with ones to a power of two
+        width = 1 << max(0, (n - 1).bit_length())
+        levels = [np.concatenate([X, self.one(width - n)], axis=1)]
+        while levels[-1].shape[1] > 1:
+            level = levels[-1]
+            levels.append(self.mul(level[:, 0::2], level[:, 1::2]))
+
+        (root,) = self.from_vector(levels.pop())
+        if root == 0:
+            raise ValueError("Cannot invert a batch containing zero")
+        inverse = self.to_vector([pow(root, -1, self.q)])
+        while levels:
+            level = levels.pop()
+            left, right = level[:, 0::2], level[:, 1::2]
+            inverses = np.empty_like(level)
+            inverses[:, 0::2] = self.mul(inverse, right)
+            inverses[:, 1::2] = self.mul(inverse, left)
+            inverse = inverses
+        return inverse[:, :n]
+
+
+class PointBatch:
+    """
+    Projective points (X : Y : Z) on a curve as three
+    VectorField arrays, the formulas below work on the
+    whole batch at once. Results of additions of P == +-Q,
+    and of doubling points of order two, have Z == 0 and
+    must be redone with the scalar formulas.
+    """
+
+    def __init__(self, field, a, x, y, z):
+        self.field = field
+        self.a = a
+        self.x = x
+        self.y = y
+        self.z = z
+
+    @classmethod
+    def from_points(cls, points, field=None):
+        E = points[0].curve
+        if E.coordinates != "projective":
+            raise ValueError("PointBatch needs projective coordinates")
+        field = field or VectorField(E.q)
+        # Plain residues, so normalised points have z == 1
+        from_field = E.field.from_field
+        x, y, z = (field.to_vector([from_field(getattr(P, c)) for P in points]) for c in "xyz")
+        return cls(field, field.to_vector([E.a]), x, y, z)
+
+    def to_points(self, E):
+        F = self.field
+        xs, ys, zs = F.from_vector(self.x), F.from_vector(self.y), F.from_vector(self.z)
+        if E.one != 1:
+            # Back to the residues the curve's field expects
+            xs, ys, zs = ([E.field.to_field(v) for v in vs] for vs in (xs, ys, zs))
+        return [E.point(E, x, y, z, check=False) for x, y, z in zip(xs, ys, zs)]
+
+    def __len__(self):
+        return self.x.shape[1]
+
+    def __getitem__(self, index):
+        return PointBatch(self.field, self.a, self.x[:, index], self.y[:, index], self.z[:, index])
+
+    def madd(self, other):
+        """
+        self + other for normalised other
+        """
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-projective.html#addition-madd-1998-cmo
+        F = self.field
+        mul, add, sub = F.mul, F.add, F.sub
+        u = sub(mul(other.y, self.z), self.y)
+        v = sub(mul(other.x, self.z), self.x)
+        uu = mul(u, u)
+        vv = mul(v, v)
+        vvv = mul(v, vv)
+        r = mul(vv, self.x)
+        a = sub(sub(mul(uu, self.z), vvv), add(r, r))
+        x3 = mul(v, a)
+        y3 = sub(mul(u, sub(r, a)), mul(vvv, self.y))
+        z3 = mul(vvv, self.z)
+        return PointBatch(F, self.a, x3, y3, z3)
+
+    def double(self):
+        # https://www.hyperelliptic.org/EFD/g1p/auto-shortw-projective.html#doubling-dbl-2007-bl
+        F = self.field
+        mul, add, sub = F.mul, F.add, F.sub
+        xx = mul(self.x, self.x)
+        zz = mul(self.z, self.z)
+        w = add(mul(zz, self.a), add(add(xx, xx), xx))
+        s = mul(self.y, self.z)
+        s = add(s, s)
+        ss = mul(s, s)
+        sss = mul(s, ss)
+        r = mul(self.y, s)
+        rr = mul(r, r)
+        t = add(self.x, r)
+        b = sub(sub(mul(t, t), xx), rr)
+        h = sub(mul(w, w), add(b, b))
+        x3 = mul(h, s)
+        y3 = sub(mul(w, sub(b, h)), add(rr, rr))
+        return PointBatch(F, self.a, x3, y3, sss)
+
+    def normalise(self):
+        """
+        Scale every point to Z == 1 in place with
+        one batch inversion. No point may be infinity.
+        """
+        F = self.field
+        z_inverse = F.inverse(self.z)
+        self.x = F.mul(self.x, z_inverse)
+        self.y = F.mul(self.y, z_inverse)
+        self.z = F.one(len(self))
+        return self